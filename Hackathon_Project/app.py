@@ -1,22 +1,65 @@
 import os
 import re
+import json
 import time
 import uuid
-from flask import Flask, request, jsonify, send_from_directory
+import math
+import hashlib
+from flask import Flask, Response, g, request, jsonify, send_from_directory, stream_with_context
 from dotenv import load_dotenv
 
 from providers.gemini_client import GeminiClient
-from descope_adapter import get_token
-from integrations.slack_client import post_summary_to_slack
-from integrations.notion_client import append_to_page
+from providers.map_reduce import MapReduceSummarizer
+from descope_adapter import get_token, invalidate_token, start_token_refresher
+from ttl_cache import TTLCache
+import metrics
+from nonce_store import make_nonce_store
+from integrations.slack_client import post_summary_to_slack, broadcast_summary_to_slack, stream_summary_to_slack
+from integrations.notion_queue import enqueue_append, job_status
+from integrations import notion_index
 from integrations.github_client import create_issue
+from integrations.github_issue_index import create_issue_deduped
+from integrations.github_batch import create_issues_batch, normalize_items
 from integrations.gcal_client import create_calendar_event
 
 load_dotenv()
 PORT = int(os.getenv("PORT", "5001"))
+NOTION_WAIT_SECS = float(os.getenv("NOTION_WAIT_SECS", "30"))
 
 app = Flask(__name__, static_folder="static")
 llm = GeminiClient()
+llm.warm()
+start_token_refresher()
+summarizer = MapReduceSummarizer(
+    llm,
+    chunk_tokens=int(os.getenv("SUMMARY_CHUNK_TOKENS", "6000")),
+    max_workers=int(os.getenv("SUMMARY_MAP_WORKERS", "4")),
+)
+
+_summary_cache = TTLCache(
+    maxsize=int(os.getenv("SUMMARY_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("SUMMARY_CACHE_TTL_SECS", "600")),
+)
+metrics.register_cache("summary", _summary_cache.stats)
+
+@metrics.REGISTRY.collector
+def _llm_samples():
+    sf = llm.inflight.stats()
+    yield "gemini_singleflight_shared_total", "counter", "Callers served by another caller's in-flight request.", {}, sf["shared"]
+    yield "gemini_singleflight_waiting", "gauge", "Callers currently waiting on an in-flight request.", {}, sf["waiting"]
+
+@app.before_request
+def _start_timer():
+    g.started = time.perf_counter()
+
+@app.after_request
+def _record_request(response):
+    started = g.pop("started", None)
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    if started is not None:
+        metrics.REQUEST_LATENCY.observe(time.perf_counter() - started, route, request.method)
+    metrics.REQUESTS.inc(route, request.method, response.status_code)
+    return response
 
 TRUSTED_AGENTS = {
     "agent_slackbot": ["summarize", "post_slack"],
@@ -26,23 +69,39 @@ TRUSTED_AGENTS = {
 }
 
 NONCE_WINDOW_SECS = 300
-_seen_nonces = set()
+_nonce_store = make_nonce_store(
+    os.getenv("NONCE_STORE", "memory"),
+    path=os.getenv("NONCE_DB_PATH"),
+    window_secs=NONCE_WINDOW_SECS,
+    bucket_secs=int(os.getenv("NONCE_BUCKET_SECS", "30")),
+    max_entries=int(os.getenv("NONCE_MAX_ENTRIES", "1000000")),
+)
+
+@metrics.REGISTRY.collector
+def _nonce_samples():
+    st = _nonce_store.stats()
+    yield "nonce_store_size", "gauge", "Nonces currently remembered for replay protection.", {}, st["size"]
+    yield "nonce_store_evictions_total", "counter", "Nonces dropped by bucket expiry.", {}, st["evictions"]
+    yield "nonce_store_replays_total", "counter", "Requests rejected as replays.", {}, st["replays"]
+    yield "nonce_store_rejected_full_total", "counter", "Requests rejected because the store was full.", {}, st["rejected_full"]
 
 def _check_agent_scope(agent: str, action: str) -> bool:
     return action in TRUSTED_AGENTS.get(agent, [])
 
 def _check_signature(req_body: bytes, ts: str, nonce: str) -> bool:
     try:
-        now = int(time.time())
-        if abs(now - int(ts)) > NONCE_WINDOW_SECS:
-            return False
-        if nonce in _seen_nonces:
-            return False
-        _seen_nonces.add(nonce)
-        return True
+        return _nonce_store.add_if_absent(nonce, int(ts))
     except Exception:
         return False
 
+AUTH_ERRORS = ("invalid_auth", "token_revoked", "token_expired", "not_authed", "account_inactive")
+
+def _invalidate_on_auth_failure(provider: str, data: dict, res: dict) -> None:
+    resp = res.get("resp") or res.get("error") or {}
+    error = resp.get("error") if isinstance(resp, dict) else None
+    if res.get("status") == 401 or error in AUTH_ERRORS:
+        invalidate_token(provider, data.get("user_id", "demo"), data.get("tenant_id"))
+
 def _slack_channel_id(value: str) -> str:
 
     if not value:
@@ -55,39 +114,125 @@ def _slack_channel_id(value: str) -> str:
 
     return value
 
-def _summarize_for_slack(raw: str) -> str:
-    prompt = (
-        "Convert the following raw updates into a Slack-ready daily standup. "
-        "Use 2–4 concise bullet points, include blockers, and a one-line title.\n\n"
-        f"{raw}"
-    )
-
-    return llm.generate(prompt)
-
-def _summarize_for_notion(raw: str) -> str:
-    prompt = (
-        "Convert these raw updates into concise meeting notes for a Notion page. "
-        "Start with a short title, then 3–6 bullets; include blockers and follow-ups. "
-        "Keep it crisp and actionable.\n\n"
-        f"{raw}"
-    )
+SLACK_PROMPT = (
+    "Convert the following raw updates into a Slack-ready daily standup. "
+    "Use 2–4 concise bullet points, include blockers, and a one-line title.\n\n"
+)
+
+NOTION_PROMPT = (
+    "Convert these raw updates into concise meeting notes for a Notion page. "
+    "Start with a short title, then 3–6 bullets; include blockers and follow-ups. "
+    "Keep it crisp and actionable.\n\n"
+)
+
+DUAL_PROMPT = (
+    "Convert the following raw updates into two summaries and return a JSON object "
+    "with exactly two string fields. \"slack\": a Slack-ready daily standup with a "
+    "one-line title and 2–4 concise bullet points, including blockers. \"notion\": "
+    "concise meeting notes for a Notion page with a short title, then 3–6 bullets; "
+    "include blockers and follow-ups. Keep both crisp and actionable.\n\n"
+)
+
+ACTION_ITEMS_PROMPT = (
+    "Extract the concrete action items and blockers from the following standup "
+    "updates and return a JSON object {\"items\": [...]}. Each item has a short "
+    "imperative \"title\" (under 80 characters), a \"body\" with the context and "
+    "owner if one is named, and \"labels\": a list of 0–2 lowercase labels such as "
+    "\"bug\", \"blocker\" or \"enhancement\". Return {\"items\": []} if there are none.\n\n"
+)
+
+def _summary_key(template: str, raw: str) -> str:
+    h = hashlib.sha256()
+    for part in (template, llm.model, raw):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+def _summarize(template: str, raw: str, bypass_cache: bool = False) -> str:
+    key = _summary_key(template, raw)
+    if not bypass_cache:
+        cached = _summary_cache.get(key)
+        if cached is not None:
+            return cached
+
+    summary = summarizer.summarize(template, raw)
+    if summary:
+        _summary_cache.set(key, summary)
+    return summary
+
+def _summarize_for_slack(raw: str, bypass_cache: bool = False) -> str:
+    return _summarize(SLACK_PROMPT, raw, bypass_cache)
+
+def _summarize_for_notion(raw: str, bypass_cache: bool = False) -> str:
+    return _summarize(NOTION_PROMPT, raw, bypass_cache)
+
+def _summarize_both(raw: str, bypass_cache: bool = False) -> dict:
+    slack_key = _summary_key(SLACK_PROMPT, raw)
+    notion_key = _summary_key(NOTION_PROMPT, raw)
+    if not bypass_cache:
+        slack = _summary_cache.get(slack_key)
+        notion = _summary_cache.get(notion_key)
+        if slack is not None and notion is not None:
+            return {"slack": slack, "notion": notion}
 
-    return llm.generate(prompt)
+    try:
+        data = llm.generate_json(summarizer.prepare(DUAL_PROMPT, raw))
+    except ValueError:
+        data = None
+
+    if not (
+        isinstance(data, dict)
+        and isinstance(data.get("slack"), str) and data["slack"].strip()
+        and isinstance(data.get("notion"), str) and data["notion"].strip()
+    ):
+        return {
+            "slack": _summarize_for_slack(raw, bypass_cache),
+            "notion": _summarize_for_notion(raw, bypass_cache),
+        }
+
+    both = {"slack": data["slack"].strip(), "notion": data["notion"].strip()}
+    _summary_cache.set(slack_key, both["slack"])
+    _summary_cache.set(notion_key, both["notion"])
+    return both
+
+def _extract_action_items(raw: str, bypass_cache: bool = False) -> list:
+    key = _summary_key(ACTION_ITEMS_PROMPT, raw)
+    if not bypass_cache:
+        cached = _summary_cache.get(key)
+        if cached is not None:
+            return cached
+
+    data = llm.generate_json(summarizer.prepare(ACTION_ITEMS_PROMPT, raw))
+    items = normalize_items(data.get("items") if isinstance(data, dict) else data)
+    _summary_cache.set(key, items)
+    return items
+
+def _sse(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
 
 @app.get("/health")
 def health():
     return {"ok": True}
 
+@app.get("/llm/stats")
+def llm_stats():
+    return jsonify({
+        **llm.stats(),
+        "summary_cache": _summary_cache.stats(),
+        "map_reduce": summarizer.stats(),
+    })
+
+@app.get("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 @app.get("/")
 def home():
     return send_from_directory("static", "index.html")
 
-@app.post("/trigger-summary")
-def trigger_summary():
-    data = request.get_json(force=True, silent=True) or {}
-    agent   = data.get("agent")
-    action  = data.get("action", "summarize")
-    messages = (data.get("messages") or "").strip()
+def _check_summary_request(data: dict):
+    agent  = data.get("agent")
+    action = data.get("action", "summarize")
 
     if not _check_agent_scope(agent, action):
         return jsonify({"error": "Unauthorized agent or action"}), 403
@@ -97,15 +242,81 @@ def trigger_summary():
     if not _check_signature((request.data or b"{}"), ts, nonce):
         return jsonify({"error": "Invalid or replayed request"}), 401
 
+    return None
+
+@app.post("/trigger-summary")
+def trigger_summary():
+    data = request.get_json(force=True, silent=True) or {}
+    messages = (data.get("messages") or "").strip()
+
+    denied = _check_summary_request(data)
+    if denied:
+        return denied
+
     if not messages:
         return jsonify({"error": "Missing 'messages' to summarize."}), 400
 
     try:
-        summary = _summarize_for_slack(messages)
+        if data.get("format") == "both":
+            both = _summarize_both(messages, bypass_cache=bool(data.get("no_cache")))
+            return jsonify({"summary": both["slack"], "summaries": both})
+
+        summary = _summarize_for_slack(messages, bypass_cache=bool(data.get("no_cache")))
         return jsonify({"summary": summary})
     except Exception as e:
         return jsonify({"error": f"Gemini summarization failed: {e}"}), 500
 
+@app.post("/trigger-summary/stream")
+def trigger_summary_stream():
+    data = request.get_json(force=True, silent=True) or {}
+    messages = (data.get("messages") or "").strip()
+
+    denied = _check_summary_request(data)
+    if denied:
+        return denied
+
+    if not messages:
+        return jsonify({"error": "Missing 'messages' to summarize."}), 400
+
+    key = _summary_key(SLACK_PROMPT, messages)
+    cached = None if data.get("no_cache") else _summary_cache.get(key)
+
+    def events():
+        started = time.perf_counter()
+        if cached is not None:
+            yield _sse("chunk", {"text": cached})
+            yield _sse("done", {"summary": cached, "cached": True, "ttft_ms": 0.0, "total_ms": 0.0})
+            return
+
+        first_token_ms = None
+        parts = []
+        try:
+            for chunk in llm.generate_stream(summarizer.prepare(SLACK_PROMPT, messages)):
+                if first_token_ms is None:
+                    first_token_ms = round((time.perf_counter() - started) * 1000, 1)
+                parts.append(chunk)
+                yield _sse("chunk", {"text": chunk})
+        except Exception as e:
+            yield _sse("error", {"error": f"Gemini summarization failed: {e}"})
+            return
+
+        summary = "".join(parts).strip()
+        if summary:
+            _summary_cache.set(key, summary)
+
+        yield _sse("done", {
+            "summary": summary,
+            "cached": False,
+            "ttft_ms": first_token_ms,
+            "total_ms": round((time.perf_counter() - started) * 1000, 1),
+        })
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.post("/slack/post")
 def slack_post():
     data = request.get_json(force=True, silent=True) or {}
@@ -118,12 +329,21 @@ def slack_post():
         return jsonify({"error": "No Slack token available (configure Descope Outbound App or DEMO_BEARER_TOKEN)"}), 401
 
     text = (data.get("text") or "").strip()
+    msgs = (data.get("messages") or "").strip()
+    if not text and msgs and data.get("progressive"):
+        channel = _slack_channel_id((data.get("channel") or "").strip())
+        if not channel:
+            return jsonify({"error": "Missing Slack 'channel' (channel ID like C09… or paste the full channel URL)."}), 400
+        return _slack_post_progressive(token, channel, msgs, data)
+
     if not text:
-        msgs = (data.get("messages") or "").strip()
         if not msgs:
             return jsonify({"error": "Provide 'text' or 'messages' to summarize."}), 400
         try:
-            text = _summarize_for_slack(msgs)
+            if data.get("format") == "both":
+                text = _summarize_both(msgs, bypass_cache=bool(data.get("no_cache")))["slack"]
+            else:
+                text = _summarize_for_slack(msgs, bypass_cache=bool(data.get("no_cache")))
         except Exception as e:
             return jsonify({"error": f"Failed to summarize via Gemini: {e}"}), 500
 
@@ -132,9 +352,75 @@ def slack_post():
         return jsonify({"error": "Missing Slack 'channel' (channel ID like C09… or paste the full channel URL)."}), 400
 
     res = post_summary_to_slack(token, channel, text)
+    _invalidate_on_auth_failure("slack", data, res)
+
+    if res.get("retry_after") is not None:
+        return jsonify(res), 429, {"Retry-After": str(max(1, math.ceil(res["retry_after"])))}
+    return jsonify(res), (200 if res.get("ok") else 400)
 
+def _slack_post_progressive(token: str, channel: str, msgs: str, data: dict):
+    key = _summary_key(SLACK_PROMPT, msgs)
+    cached = None if data.get("no_cache") else _summary_cache.get(key)
+    if cached is not None:
+        res = post_summary_to_slack(token, channel, cached)
+    else:
+        try:
+            prompt = summarizer.prepare(SLACK_PROMPT, msgs)
+        except Exception as e:
+            return jsonify({"error": f"Failed to summarize via Gemini: {e}"}), 500
+        res = stream_summary_to_slack(token, channel, llm.generate_stream(prompt))
+        if res.get("ok") and res.get("text"):
+            _summary_cache.set(key, res["text"])
+
+    _invalidate_on_auth_failure("slack", data, res)
+    if res.get("stream_failed"):
+        # Same failure as a non-streamed summary, which answers 500.
+        return jsonify(res), 500
+    if res.get("final_update_failed"):
+        return jsonify(res), 207
+    if res.get("retry_after") is not None:
+        return jsonify(res), 429, {"Retry-After": str(max(1, math.ceil(res["retry_after"])))}
     return jsonify(res), (200 if res.get("ok") else 400)
 
+@app.post("/slack/broadcast")
+def slack_broadcast():
+    data = request.get_json(force=True, silent=True) or {}
+    agent = data.get("agent")
+    if not _check_agent_scope(agent, "post_slack"):
+        return jsonify({"error": "Unauthorized"}), 403
+
+    token = get_token("slack", user_id=data.get("user_id","demo"), tenant_id=data.get("tenant_id"))
+    if not token:
+        return jsonify({"error": "No Slack token available (configure Descope Outbound App or DEMO_BEARER_TOKEN)"}), 401
+
+    channels = data.get("channels") or []
+    if isinstance(channels, str):
+        channels = channels.split(",")
+    channels = [_slack_channel_id(str(c).strip()) for c in channels if str(c).strip()]
+    if not channels:
+        return jsonify({"error": "Provide 'channels' as a list of channel IDs, URLs or #names."}), 400
+
+    text = (data.get("text") or "").strip()
+    if not text:
+        msgs = (data.get("messages") or "").strip()
+        if not msgs:
+            return jsonify({"error": "Provide 'text' or 'messages' to summarize."}), 400
+        try:
+            text = _summarize_for_slack(msgs, bypass_cache=bool(data.get("no_cache")))
+        except Exception as e:
+            return jsonify({"error": f"Failed to summarize via Gemini: {e}"}), 500
+
+    res = broadcast_summary_to_slack(token, channels, text)
+    _invalidate_on_auth_failure("slack", data, res)
+
+    if res.get("retry_after") is not None:
+        return jsonify(res), 429, {"Retry-After": str(max(1, math.ceil(res["retry_after"])))}
+    if not res.get("ok") and not res.get("results"):
+        # Authorization or input failed before any channel was tried.
+        error = (res.get("resp") or {}).get("error")
+        return jsonify(res), (401 if error in AUTH_ERRORS else 400)
+    return jsonify(res), res.get("status", 200 if res.get("ok") else 400)
+
 @app.post("/notion/update")
 def notion_update():
     data = request.get_json(force=True, silent=True) or {}
@@ -147,22 +433,65 @@ def notion_update():
         return jsonify({"error": "No Notion token available (configure Descope Outbound App or DEMO_BEARER_TOKEN)"}), 401
 
     text = (data.get("text") or "").strip()
+    markdown = bool(data.get("markdown"))
     if not text:
         msgs = (data.get("messages") or "").strip()
         if not msgs:
             return jsonify({"error": "Provide 'text' or 'messages' to summarize."}), 400
+        markdown = data.get("markdown") is not False
         try:
-            text = _summarize_for_notion(msgs)
+            if data.get("format") == "both":
+                text = _summarize_both(msgs, bypass_cache=bool(data.get("no_cache")))["notion"]
+            else:
+                text = _summarize_for_notion(msgs, bypass_cache=bool(data.get("no_cache")))
         except Exception as e:
             return jsonify({"error": f"Failed to summarize via Gemini: {e}"}), 500
 
-    page_id = (data.get("page_id") or "").strip()
-    if not page_id:
-        return jsonify({"error": "Missing 'page_id' (copy the hex id from the Notion page URL)."}), 400
+    page_ref = (data.get("page_id") or "").strip()
+    if not page_ref:
+        return jsonify({"error": "Missing 'page_id' (a page id, URL, title or alias)."}), 400
+    page_id, error = notion_index.resolve(token, page_ref)
+    if error:
+        headers = {"Retry-After": "2"} if error["status"] == 503 else {}
+        return jsonify(error), error["status"], headers
+
+    job, error = enqueue_append(
+        token, page_id, text, markdown=markdown,
+        on_done=lambda res: _invalidate_on_auth_failure("notion", data, res),
+    )
+    if error:
+        return jsonify(error), 400
+
+    if not data.get("wait"):
+        return jsonify({"ok": True, "queued": True, "job_id": job.id}), 202
 
-    res = append_to_page(token, page_id, text)
+    res = job.wait(NOTION_WAIT_SECS)
+    if res is None:
+        return jsonify({"ok": False, "queued": True, "job_id": job.id, "error": "Timed out waiting for Notion; the append is still queued."}), 202
     return jsonify(res), (200 if res.get("ok") else 400)
 
+@app.get("/notion/pages")
+def notion_pages():
+    if not _check_agent_scope(request.args.get("agent"), "update_notion"):
+        return jsonify({"error": "Unauthorized"}), 403
+    token = get_token("notion", user_id=request.args.get("user_id", "demo"), tenant_id=request.args.get("tenant_id"))
+    if not token:
+        return jsonify({"error": "No Notion token available (configure Descope Outbound App or DEMO_BEARER_TOKEN)"}), 401
+    try:
+        limit = min(max(int(request.args.get("limit", "10")), 1), 50)
+    except ValueError:
+        return jsonify({"error": "'limit' must be an integer."}), 400
+    return jsonify({"pages": notion_index.search(token, request.args.get("q", ""), limit)})
+
+@app.get("/notion/jobs/<job_id>")
+def notion_job(job_id):
+    if not _check_agent_scope(request.args.get("agent"), "update_notion"):
+        return jsonify({"error": "Unauthorized"}), 403
+    st = job_status(job_id)
+    if st is None:
+        return jsonify({"error": "Unknown or expired job id."}), 404
+    return jsonify(st)
+
 @app.post("/github/issue")
 def github_issue():
     data = request.get_json(force=True, silent=True) or {}
@@ -178,9 +507,54 @@ def github_issue():
     title = (data.get("title") or "From Agent").strip()
     body  = (data.get("body")  or "").strip()
 
-    res = create_issue(token, repo, title, body)
+    # "dedupe": true skips exact title matches; "fuzzy" also holds back issues
+    # with similar open ones and returns them as candidates to confirm.
+    dedupe = data.get("dedupe", True)
+    if dedupe:
+        res = create_issue_deduped(
+            token, repo, title, body,
+            on_duplicate=data.get("on_duplicate") or "skip",
+            fuzzy=dedupe == "fuzzy",
+        )
+    else:
+        res = create_issue(token, repo, title, body)
+    _invalidate_on_auth_failure("github", data, res)
+    if res.get("created") is False:
+        return jsonify(res), res["status"]
     return jsonify(res), (200 if res.get("ok") else 400)
 
+@app.post("/github/issues/batch")
+def github_issues_batch():
+    data = request.get_json(force=True, silent=True) or {}
+    agent = data.get("agent")
+    if not _check_agent_scope(agent, "create_issue"):
+        return jsonify({"error": "Unauthorized"}), 403
+
+    token = get_token("github", user_id=data.get("user_id","demo"), tenant_id=data.get("tenant_id"))
+    if not token:
+        return jsonify({"error": "No GitHub token available (configure Descope Outbound App or DEMO_BEARER_TOKEN)"}), 401
+
+    repo = (data.get("repo") or "").strip()
+    if not repo:
+        return jsonify({"error": "Missing 'repo' (owner/name)."}), 400
+
+    # Callers retry a partial failure by sending back the "retry" list as "items".
+    items = data.get("items")
+    if not items:
+        source = (data.get("summary") or data.get("messages") or "").strip()
+        if not source:
+            return jsonify({"error": "Provide 'items', 'summary' or 'messages'."}), 400
+        try:
+            items = _extract_action_items(source, bypass_cache=bool(data.get("no_cache")))
+        except Exception as e:
+            return jsonify({"error": f"Failed to extract action items via Gemini: {e}"}), 500
+        if not items:
+            return jsonify({"ok": True, "results": [], "created": 0, "duplicates": 0, "failed": 0, "retry": []})
+
+    res = create_issues_batch(token, repo, items, on_duplicate=data.get("on_duplicate") or "skip")
+    _invalidate_on_auth_failure("github", data, res)
+    return jsonify(res), res.get("status", 200)
+
 @app.post("/gcal/event")
 def gcal_event():
     data = request.get_json(force=True, silent=True) or {}
@@ -206,6 +580,7 @@ def gcal_event():
 
     from integrations.gcal_client import check_conflicts, create_calendar_event
     chk = check_conflicts(token, calendar_id, start_iso, end_iso)
+    _invalidate_on_auth_failure("gcal", {"user_id": data.get("user_id", "demo")}, chk)
     if not chk.get("ok"):
         return jsonify({"ok": False, "status": chk.get("status"), "error": chk.get("resp")}), 400
 
@@ -219,6 +594,7 @@ def gcal_event():
         }), 200
 
     res = create_calendar_event(token, calendar_id, summary, start_iso, end_iso, description=description)
+    _invalidate_on_auth_failure("gcal", {"user_id": data.get("user_id", "demo")}, res)
     return jsonify(res), (200 if res.get("ok") else 400)
 
 
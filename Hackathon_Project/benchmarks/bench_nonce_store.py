@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+import uuid
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nonce_store import make_nonce_store
+
+WINDOW = 300
+
+def run_set(n: int, rps: float, nonces):
+    seen = set()
+    start_clock = 1_700_000_000.0
+    t0 = time.perf_counter()
+    for i in range(n):
+        now = start_clock + i / rps
+        ts = int(now)
+        nonce = nonces[i]
+        if abs(now - ts) > WINDOW or nonce in seen:
+            continue
+        seen.add(nonce)
+    return time.perf_counter() - t0, len(seen)
+
+def run_store(n: int, rps: float, nonces, backend: str, path: str, bucket_secs: int, max_entries: int):
+    store = make_nonce_store(backend, path=path, window_secs=WINDOW, bucket_secs=bucket_secs, max_entries=max_entries)
+    start_clock = 1_700_000_000.0
+    peak = 0
+    t0 = time.perf_counter()
+    for i in range(n):
+        now = start_clock + i / rps
+        store.add_if_absent(nonces[i], int(now), now=now)
+        if not i & 0xFFFF:
+            peak = max(peak, len(store))
+    return time.perf_counter() - t0, max(peak, len(store)), store.stats()
+
+def measure(fn, *args):
+    tracemalloc.start()
+    result = fn(*args)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, peak_bytes
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay-store throughput and memory, old set vs bucketed store.")
+    parser.add_argument("-n", type=int, default=2_000_000, help="requests to simulate")
+    parser.add_argument("--rps", type=float, default=1000.0, help="simulated requests per second")
+    parser.add_argument("--backend", choices=("memory", "sqlite"), default="memory")
+    parser.add_argument("--db", default=None, help="SQLite path for --backend sqlite (default: temp file)")
+    parser.add_argument("--bucket-secs", type=int, default=30)
+    parser.add_argument("--max-entries", type=int, default=1_000_000)
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (faster, timing only)")
+    args = parser.parse_args()
+
+    path = args.db
+    if args.backend == "sqlite" and not path:
+        path = os.path.join(tempfile.mkdtemp(), "bench-nonces.db")
+
+    nonces = [uuid.uuid4().hex for _ in range(args.n)]
+    print(f"requests={args.n:,} simulated_rps={args.rps:,.0f} simulated_secs={args.n / args.rps:,.0f}")
+
+    if args.no_memory:
+        (set_secs, set_size), set_bytes = run_set(args.n, args.rps, nonces), None
+        (store_secs, peak, stats), store_bytes = run_store(args.n, args.rps, nonces, args.backend, path, args.bucket_secs, args.max_entries), None
+    else:
+        (set_secs, set_size), set_bytes = measure(run_set, args.n, args.rps, nonces)
+        (store_secs, peak, stats), store_bytes = measure(run_store, args.n, args.rps, nonces, args.backend, path, args.bucket_secs, args.max_entries)
+
+    def fmt_mem(b):
+        return "n/a" if b is None else f"{b / 1e6:,.1f} MB"
+
+    print(f"unbounded set : {args.n / set_secs:>12,.0f} req/s  entries={set_size:>10,}  peak_mem={fmt_mem(set_bytes)}")
+    print(f"{args.backend + ' store':<14}: {args.n / store_secs:>12,.0f} req/s  entries={peak:>10,}  peak_mem={fmt_mem(store_bytes)}")
+    print(f"store stats   : {stats}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from integrations.notion_markdown import markdown_to_blocks
+
+SECTION = """## Standup — **Team {i}**
+Yesterday the team shipped the *billing* migration and fixed `retry_after` parsing; see [PR {i}](https://github.com/acme/app/pull/{i}).
+Some context that wraps onto a second line with __bold__, _italic_ and ~~struck~~ words, plus snake_case_names.
+
+- **Alice**: finishing the webhook backfill
+- Bob: blocked on **API keys** from `infra`
+- [ ] follow up with *Carol* about the rollout
+- [x] rotate the staging credentials
+1. ship the fix
+2. write the postmortem
+> Customers on the legacy plan are not affected.
+---
+```python
+def handler(event):
+    return {{"ok": True, "id": {i}}}
+```
+"""
+
+def document(sections: int) -> str:
+    return "\n".join(SECTION.format(i=i) for i in range(sections))
+
+def run(source, repeat: int):
+    best = float("inf")
+    blocks = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        blocks = sum(1 for _ in markdown_to_blocks(source))
+        best = min(best, time.perf_counter() - t0)
+    return best, blocks
+
+def main():
+    parser = argparse.ArgumentParser(description="Markdown to Notion blocks conversion throughput.")
+    parser.add_argument("--sections", type=int, default=250, help="standup sections in the 1x document")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per size; the best is reported")
+    parser.add_argument("--pathological", type=int, default=200_000, help="length of the adversarial single-line inputs")
+    args = parser.parse_args()
+
+    base = None
+    for scale in (1, 4, 16):
+        doc = document(args.sections * scale)
+        secs, blocks = run(doc, args.repeat)
+        per_mb = secs / (len(doc) / 1e6)
+        base = base or per_mb
+        print(f"{scale:>3}x  chars={len(doc):>11,}  blocks={blocks:>8,}  {secs * 1e3:>9.1f} ms  "
+              f"{len(doc) / secs / 1e6:>6.1f} MB/s  ms/MB={per_mb * 1e3:>7.1f} ({per_mb / base:.2f}x of 1x)")
+
+    doc = document(args.sections * 4)
+    chunks = [doc[i:i + 64] for i in range(0, len(doc), 64)]
+    secs, blocks = run(chunks, args.repeat)
+    print(f"streamed 64-char chunks (4x)  blocks={blocks:>8,}  {secs * 1e3:>9.1f} ms")
+
+    n = args.pathological
+    for label, line in (
+        ("'*' * n", "*" * n),
+        ("'_' * n", "_" * n),
+        ("'[' * n", "[" * n),
+        ("'`' * n", "`" * n),
+        ("'[x](' * n", "[x](" * (n // 4)),
+        ("'**a' * n", "**a" * (n // 3)),
+    ):
+        secs, blocks = run(line, args.repeat)
+        print(f"pathological {label:<12} chars={len(line):>9,}  blocks={blocks:>5,}  {secs * 1e3:>9.1f} ms")
+
+if __name__ == "__main__":
+    main()
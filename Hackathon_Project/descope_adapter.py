@@ -1,9 +1,17 @@
 import os
 import json
+import time
+import heapq
+import random
 import logging
-from typing import Optional, Dict, Any
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple
 
-import requests
+import http_pool
+import metrics
+from metrics import upstream_timer
+from ttl_cache import TTLCache
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
@@ -12,6 +20,12 @@ DESCOPE_API = "https://api.descope.com"
 PROJECT_ID = os.getenv("DESCOPE_PROJECT_ID", "").strip()
 MGMT_KEY   = os.getenv("DESCOPE_AUTH_MANAGEMENT_KEY", "").strip()
 
+TOKEN_TTL_SECS = float(os.getenv("DESCOPE_TOKEN_TTL_SECS", "300"))
+TOKEN_EXPIRY_SKEW_SECS = float(os.getenv("DESCOPE_TOKEN_EXPIRY_SKEW_SECS", "30"))
+
+_token_cache = TTLCache(maxsize=int(os.getenv("DESCOPE_TOKEN_CACHE_SIZE", "1024")), ttl=TOKEN_TTL_SECS)
+metrics.register_cache("descope_token", _token_cache.stats)
+
 APP_IDS: Dict[str, str] = {
     "slack": "slack",
     "notion": "notion",
@@ -41,7 +55,7 @@ def start_connect(provider: str, login_id: str, tenant_id: Optional[str] = None)
     if tenant_id:
         payload["tenantId"] = tenant_id
 
-    r = requests.post(url, headers=_headers(), json=payload, timeout=20)
+    r = http_pool.post(url, headers=_headers(), json=payload, timeout=20)
     if r.status_code != 200:
         log.debug("Descope REST: start_connect non-200 %s %s", r.status_code, r.text)
         return {"ok": False, "status": r.status_code, "resp": r.json() if r.content else {}}
@@ -59,7 +73,9 @@ def get_connection(provider: str, login_id: str, tenant_id: Optional[str] = None
     if tenant_id:
         payload["tenantId"] = tenant_id
 
-    r = requests.post(url, headers=_headers(), json=payload, timeout=20)
+    with upstream_timer("descope", "get_connection") as t:
+        r = http_pool.post(url, headers=_headers(), json=payload, timeout=20)
+        t.status = r.status_code
     if r.status_code != 200:
         log.debug("Descope REST: get_connection non-200 %s %s", r.status_code, r.text)
         return {"ok": False, "status": r.status_code, "resp": r.json() if r.content else {}}
@@ -79,16 +95,42 @@ def _demo_token(provider: str) -> Optional[str]:
         return None
     return os.getenv(env_name) or None
 
-def get_token(provider: str, user_id: str, tenant_id: Optional[str]) -> Optional[str]:
-    demo = _demo_token(provider)
-    if demo:
-        log.debug("get_token: using DEMO token for provider=%s", provider)
-        return demo
+def _token_key(provider: str, user_id: str, tenant_id: Optional[str]):
+    return (APP_IDS.get(provider, provider), user_id, tenant_id or "")
 
-    if not PROJECT_ID or not MGMT_KEY:
-        log.debug("get_token: project or management key missing; cannot use Descope")
-        return None
+def _token_expires_in(data: Dict[str, Any]) -> Optional[float]:
+    sources = [data, data.get("token"), data.get("credentials")]
+    for src in sources:
+        if not isinstance(src, dict):
+            continue
+        for field in ("expiresIn", "expires_in"):
+            if src.get(field):
+                return float(src[field])
+        for field in ("accessTokenExpiry", "expiresAt", "expires_at", "expiry"):
+            value = src.get(field)
+            if not value:
+                continue
+            try:
+                at = float(value)
+            except (TypeError, ValueError):
+                continue
+            if at > 1e12:
+                at /= 1000.0
+            return at - time.time()
+    return None
+
+def _extract_token(data: Dict[str, Any]) -> Optional[str]:
+    token = data.get("token")
+    if isinstance(token, dict):
+        token = token.get("accessToken") or token.get("access_token")
+    return (
+        data.get("accessToken")
+        or token
+        or data.get("botToken")
+        or (data.get("credentials") or {}).get("access_token")
+    )
 
+def _fetch_token(provider: str, user_id: str, tenant_id: Optional[str]) -> Optional[Tuple[str, float]]:
     conn = get_connection(provider, user_id, tenant_id)
     if not conn.get("ok"):
         log.debug("get_token: get_connection failed %s", conn)
@@ -96,14 +138,186 @@ def get_token(provider: str, user_id: str, tenant_id: Optional[str]) -> Optional
 
     data = conn.get("resp") or {}
 
-    token = (
-        data.get("accessToken")
-        or data.get("token")
-        or data.get("botToken")
-        or (data.get("credentials") or {}).get("access_token")
-    )
+    token = _extract_token(data)
     if not token:
         log.debug("get_token: no token in connection payload: %s", json.dumps(data)[:400])
         return None
 
+    expires_in = _token_expires_in(data)
+    ttl = TOKEN_TTL_SECS if expires_in is None else expires_in - TOKEN_EXPIRY_SKEW_SECS
+    return token, ttl
+
+_REFRESHES = metrics.REGISTRY.register(metrics.Counter(
+    "descope_token_refresh_total", "Background outbound-token refreshes by result.", ("app", "result"),
+))
+_REFRESH_LEAD = metrics.REGISTRY.register(metrics.Histogram(
+    "descope_token_refresh_lead_seconds", "Time left on the cached token when it was refreshed.", ("app",),
+    buckets=(5, 15, 30, 60, 120, 300, 600, 1800, 3600),
+))
+
+class TokenRefresher:
+    def __init__(
+        self,
+        margin_secs: float = 60.0,
+        jitter_secs: float = 10.0,
+        idle_secs: float = 3600.0,
+        retry_secs: float = 30.0,
+        max_workers: int = 4,
+    ):
+        self.margin_secs = margin_secs
+        self.jitter_secs = jitter_secs
+        self.idle_secs = idle_secs
+        self.retry_secs = retry_secs
+        self.max_workers = max(1, int(max_workers))
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[float, Tuple]] = []
+        self._due: Dict[Tuple, float] = {}
+        self._expires: Dict[Tuple, float] = {}
+        self._last_used: Dict[Tuple, float] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def _schedule(self, key: Tuple, due: float) -> None:
+        self._due[key] = due
+        heapq.heappush(self._heap, (due, key))
+        self._cond.notify()
+
+    def track(self, key: Tuple, ttl: float, used: bool = True) -> None:
+        now = time.monotonic()
+        lead = self.margin_secs + random.uniform(0, self.jitter_secs)
+        with self._cond:
+            if used or key not in self._last_used:
+                self._last_used[key] = now
+            self._expires[key] = now + ttl
+            self._schedule(key, now + max(0.0, ttl - lead))
+
+    def touch(self, key: Tuple) -> None:
+        if key in self._due:
+            self._last_used[key] = time.monotonic()
+
+    def forget(self, key: Tuple) -> None:
+        with self._cond:
+            self._due.pop(key, None)
+            self._expires.pop(key, None)
+            self._last_used.pop(key, None)
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="token-refresh")
+            self._thread = threading.Thread(target=self._run, name="token-refresher", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._pool:
+            self._pool.shutdown(wait=False)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    now = time.monotonic()
+                    while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+                        heapq.heappop(self._heap)
+                    if self._heap and self._heap[0][0] <= now:
+                        _, key = heapq.heappop(self._heap)
+                        break
+                    self._cond.wait(timeout=(self._heap[0][0] - now) if self._heap else None)
+                if self._stopped:
+                    return
+                self._due.pop(key, None)
+                idle = time.monotonic() - self._last_used.get(key, 0.0) > self.idle_secs
+                if idle:
+                    self._expires.pop(key, None)
+                    self._last_used.pop(key, None)
+            if not idle:
+                self._pool.submit(self._refresh, key)
+
+    def _refresh(self, key: Tuple) -> None:
+        app_id = key[0]
+        fetched = None
+        try:
+            fetched = _fetch_token(app_id, key[1], key[2] or None)
+        except Exception as e:
+            log.debug("token refresh failed for provider=%s: %s", app_id, e)
+
+        now = time.monotonic()
+        with self._cond:
+            expires_at = self._expires.get(key, now)
+            if key not in self._last_used:
+                return
+            if not fetched:
+                _REFRESHES.inc(app_id, "failure")
+                if expires_at - now > self.retry_secs:
+                    self._schedule(key, now + self.retry_secs)
+                else:
+                    self._expires.pop(key, None)
+                    self._last_used.pop(key, None)
+                return
+
+        token, ttl = fetched
+        _REFRESHES.inc(app_id, "success")
+        _REFRESH_LEAD.observe(max(0.0, expires_at - now), app_id)
+        _token_cache.set(key, token, ttl=ttl)
+        if ttl > 0:
+            self.track(key, ttl, used=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {"tracked": len(self._last_used), "scheduled": len(self._due)}
+
+_refresher = TokenRefresher(
+    margin_secs=float(os.getenv("DESCOPE_REFRESH_MARGIN_SECS", "60")),
+    jitter_secs=float(os.getenv("DESCOPE_REFRESH_JITTER_SECS", "10")),
+    idle_secs=float(os.getenv("DESCOPE_REFRESH_IDLE_SECS", "3600")),
+    max_workers=int(os.getenv("DESCOPE_REFRESH_WORKERS", "4")),
+)
+
+@metrics.REGISTRY.collector
+def _refresher_samples():
+    yield "descope_token_refresh_tracked", "gauge", "Outbound connections kept warm in the background.", {}, _refresher.stats()["tracked"]
+
+def start_token_refresher() -> None:
+    if PROJECT_ID and MGMT_KEY:
+        _refresher.start()
+
+def invalidate_token(provider: str, user_id: str, tenant_id: Optional[str]) -> bool:
+    key = _token_key(provider, user_id, tenant_id)
+    _refresher.forget(key)
+    dropped = _token_cache.invalidate(key)
+    if dropped:
+        log.debug("invalidate_token: dropped cached token for provider=%s", provider)
+    return dropped
+
+def get_token(provider: str, user_id: str, tenant_id: Optional[str]) -> Optional[str]:
+    demo = _demo_token(provider)
+    if demo:
+        log.debug("get_token: using DEMO token for provider=%s", provider)
+        return demo
+
+    if not PROJECT_ID or not MGMT_KEY:
+        log.debug("get_token: project or management key missing; cannot use Descope")
+        return None
+
+    key = _token_key(provider, user_id, tenant_id)
+    cached = _token_cache.get(key)
+    if cached:
+        _refresher.touch(key)
+        return cached
+
+    fetched = _fetch_token(provider, user_id, tenant_id)
+    if not fetched:
+        return None
+
+    token, ttl = fetched
+    _token_cache.set(key, token, ttl=ttl)
+    if ttl > 0:
+        _refresher.track(key, ttl)
+
     return token
@@ -1,5 +1,7 @@
 
-import requests
+import http_pool
+
+from metrics import upstream_timer
 
 GCAL_API = "https://www.googleapis.com/calendar/v3"
 
@@ -18,7 +20,9 @@ def check_conflicts(token: str, calendar_id: str, start_iso: str, end_iso: str):
         "maxResults": 10,
     }
     url = f"{GCAL_API}/calendars/{calendar_id}/events"
-    r = requests.get(url, headers=_auth_headers(token), params=params, timeout=15)
+    with upstream_timer("gcal", "list_events") as t:
+        r = http_pool.get(url, headers=_auth_headers(token), params=params, timeout=15)
+        t.status = r.status_code
     if r.status_code != 200:
         return {"ok": False, "status": r.status_code, "resp": r.json() if r.headers.get("content-type","").startswith("application/json") else {"text": r.text}}
     data = r.json()
@@ -45,12 +49,14 @@ def create_calendar_event(token: str, calendar_id: str, summary: str, start_iso:
     if description:
         payload["description"] = description
 
-    r = requests.post(
-        f"{GCAL_API}/calendars/{calendar_id}/events",
-        headers=_auth_headers(token),
-        json=payload,
-        timeout=15,
-    )
+    with upstream_timer("gcal", "insert_event") as t:
+        r = http_pool.post(
+            f"{GCAL_API}/calendars/{calendar_id}/events",
+            headers=_auth_headers(token),
+            json=payload,
+            timeout=15,
+        )
+        t.status = r.status_code
     if r.status_code in (200, 201):
         return {"ok": True, "status": r.status_code, "event": r.json()}
     try:
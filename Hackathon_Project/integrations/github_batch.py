@@ -0,0 +1,154 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from integrations.github_client import list_labels, validate_repo
+from integrations.github_issue_index import create_issue_deduped, find_duplicate
+from token_bucket import TokenBucket
+from token_hash import token_hash
+
+log = logging.getLogger(__name__)
+
+# GitHub's secondary limits allow roughly 80 content-creating requests a minute
+# and penalize large concurrent bursts, so writes fan out to a small pool and
+# draw from a per-token bucket.
+CONCURRENCY = int(os.getenv("GITHUB_BATCH_CONCURRENCY", "5"))
+CREATES_PER_MINUTE = float(os.getenv("GITHUB_CREATES_PER_MINUTE", "80"))
+CREATE_BURST = float(os.getenv("GITHUB_CREATE_BURST", "10"))
+MAX_RETRIES = int(os.getenv("GITHUB_BATCH_MAX_RETRIES", "2"))
+MAX_RETRY_AFTER_SECS = float(os.getenv("GITHUB_BATCH_MAX_RETRY_AFTER_SECS", "30"))
+MAX_ITEMS = 50
+MAX_TITLE_CHARS = 256
+
+_pool = ThreadPoolExecutor(max_workers=CONCURRENCY, thread_name_prefix="github-batch")
+_buckets: Dict[str, TokenBucket] = {}
+_lock = threading.Lock()
+
+def _pace(key: str) -> None:
+    with _lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = _buckets[key] = TokenBucket(CREATES_PER_MINUTE, CREATE_BURST)
+        _, wait = bucket.reserve(time.monotonic(), float("inf"))
+    if wait:
+        time.sleep(wait)
+
+def _penalize(key: str, retry_after: float) -> None:
+    with _lock:
+        bucket = _buckets.get(key)
+        if bucket is not None:
+            bucket.penalize(time.monotonic(), retry_after)
+
+def _recover(key: str) -> None:
+    with _lock:
+        bucket = _buckets.get(key)
+        if bucket is not None:
+            bucket.recover()
+
+def normalize_items(items: Any) -> List[Dict[str, Any]]:
+    out = []
+    for item in items if isinstance(items, list) else []:
+        if isinstance(item, str):
+            item = {"title": item}
+        if not isinstance(item, dict):
+            continue
+        title = str(item.get("title") or "").strip()
+        if not title:
+            continue
+        labels = item.get("labels")
+        out.append({
+            "title": title[:MAX_TITLE_CHARS],
+            "body": str(item.get("body") or "").strip(),
+            "labels": [str(l) for l in labels if str(l).strip()] if isinstance(labels, list) else [],
+        })
+    return out[:MAX_ITEMS]
+
+def _known_labels(token: str, repo: str) -> Optional[Dict[str, str]]:
+    res = list_labels(token, repo)
+    if not res["ok"]:
+        return None
+    return {label["name"].lower(): label["name"] for label in res["resp"] if label.get("name")}
+
+def _create_one(token: str, repo: str, index: int, item: Dict[str, Any], on_duplicate: str) -> Dict[str, Any]:
+    key = token_hash(token)
+    attempts = 0
+    res: Dict[str, Any] = {}
+    try:
+        while True:
+            # A skipped duplicate is answered from the index without a write, so
+            # it should not spend one of the token's create slots.
+            if on_duplicate != "skip" or find_duplicate(token, repo, item["title"]) is None:
+                _pace(key)
+            attempts += 1
+            res = create_issue_deduped(token, repo, item["title"], item["body"], on_duplicate, item["labels"] or None)
+            retry_after = res.get("retry_after")
+            if retry_after is None or attempts > MAX_RETRIES or retry_after > MAX_RETRY_AFTER_SECS:
+                break
+            log.debug("github batch: rate limited on item %d, retrying in %.1fs", index, retry_after)
+            _penalize(key, retry_after)
+        if res.get("ok"):
+            _recover(key)
+    except Exception as e:
+        res = {"ok": False, "status": 500, "resp": {"error": str(e)}}
+
+    resp = res.get("resp") if isinstance(res.get("resp"), dict) else {}
+    dup = res.get("duplicate_of")
+    result = {
+        "index": index,
+        "title": item["title"],
+        # A skipped or commented duplicate is handled, even though nothing was created.
+        "ok": bool(res.get("ok") or res.get("commented") or (dup and res.get("status") == 409)),
+        "status": res.get("status"),
+        "number": dup["number"] if dup else resp.get("number"),
+        "url": dup["url"] if dup else resp.get("html_url"),
+        "attempts": attempts,
+    }
+    if dup:
+        result.update(duplicate_of=dup, commented=res.get("commented", False))
+    if not result["ok"]:
+        result["error"] = resp.get("error") or resp.get("message") or f"GitHub returned {res.get('status')}"
+        if res.get("retry_after") is not None:
+            result["retry_after"] = res["retry_after"]
+    return result
+
+def create_issues_batch(token: str, repo_full_name: str, items: Any, on_duplicate: str = "skip") -> dict:
+    items = normalize_items(items)
+    if not items:
+        return {"ok": False, "status": 400, "resp": {"error": "no action items with a title"}, "results": [], "retry": []}
+
+    ok, error = validate_repo(token, repo_full_name)
+    if not ok:
+        error.update(results=[], retry=items)
+        return error
+
+    # Unknown labels would be created by collaborators and silently dropped for
+    # everyone else; keep only the ones the repo already has.
+    known = _known_labels(token, repo_full_name) if any(item["labels"] for item in items) else {}
+    for item in items:
+        item["labels"] = [known[l.lower()] for l in item["labels"] if known and l.lower() in known]
+
+    futures = [_pool.submit(_create_one, token, repo_full_name, i, item, on_duplicate) for i, item in enumerate(items)]
+    results = [f.result() for f in futures]
+
+    failed = [r for r in results if not r["ok"]]
+    auth_failure = next((r["status"] for r in failed if r["status"] == 401), None)
+    if not failed:
+        status = 200
+    elif len(failed) < len(results):
+        status = 207
+    else:
+        # Nothing went through: pass on a shared upstream status, else 502.
+        statuses = {r["status"] for r in failed}
+        status = statuses.pop() if len(statuses) == 1 and None not in statuses else 502
+    return {
+        "ok": not failed,
+        "status": auth_failure or status,
+        "results": results,
+        "created": sum(1 for r in results if r["ok"] and "duplicate_of" not in r),
+        "duplicates": sum(1 for r in results if "duplicate_of" in r),
+        "failed": len(failed),
+        "retry": [items[r["index"]] for r in failed],
+    }
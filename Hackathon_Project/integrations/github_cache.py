@@ -0,0 +1,151 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import http_pool
+import metrics
+from metrics import upstream_timer
+from token_hash import token_hash
+
+GITHUB_API = "https://api.github.com"
+PER_REPO = int(os.getenv("GITHUB_CACHE_PER_REPO", "64"))
+MAX_REPOS = int(os.getenv("GITHUB_CACHE_MAX_REPOS", "256"))
+
+class ConditionalCache:
+    def __init__(self, per_repo: int = PER_REPO, max_repos: int = MAX_REPOS):
+        self.per_repo = max(1, per_repo)
+        self.max_repos = max(1, max_repos)
+        self._lock = threading.Lock()
+        self._repos: "OrderedDict[str, OrderedDict[Tuple, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.fresh = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rate_remaining: Optional[int] = None
+
+    def lookup(self, repo: str, key: Tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entries = self._repos.get(repo)
+            entry = entries.get(key) if entries is not None else None
+            if entry is not None:
+                entries.move_to_end(key)
+                self._repos.move_to_end(repo)
+            return entry
+
+    def store(self, repo: str, key: Tuple, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            entries = self._repos.get(repo)
+            if entries is None:
+                entries = self._repos[repo] = OrderedDict()
+            entries[key] = entry
+            entries.move_to_end(key)
+            self._repos.move_to_end(repo)
+            while len(entries) > self.per_repo:
+                entries.popitem(last=False)
+                self.evictions += 1
+            while len(self._repos) > self.max_repos:
+                _, dropped = self._repos.popitem(last=False)
+                self.evictions += len(dropped)
+
+    def count(self, counter: str) -> None:
+        # Worker pools call cached_get concurrently; += is not atomic.
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def invalidate(self, repo: str, key: Optional[Tuple] = None) -> None:
+        with self._lock:
+            if key is None:
+                self._repos.pop(repo, None)
+            elif repo in self._repos:
+                self._repos[repo].pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = sum(len(entries) for entries in self._repos.values())
+            repos = len(self._repos)
+            hits, fresh, misses = self.hits, self.fresh, self.misses
+        lookups = hits + fresh + misses
+        return {
+            "size": size,
+            "repos": repos,
+            "hits": hits + fresh,
+            "revalidated": hits,
+            "fresh": fresh,
+            "misses": misses,
+            "hit_rate": (hits + fresh) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "rate_remaining": self.rate_remaining,
+        }
+
+cache = ConditionalCache()
+metrics.register_cache("github_conditional", cache.stats)
+
+def headers(token: str) -> Dict[str, str]:
+    return {
+        "Authorization": f"Bearer {token}",
+        "Accept": "application/vnd.github+json",
+        "X-GitHub-Api-Version": "2022-11-28",
+    }
+
+def _result(entry: Dict[str, Any], cached: bool) -> dict:
+    return {"ok": True, "status": entry["status"], "resp": entry["body"], "next": entry["next"], "cached": cached}
+
+def cached_get(
+    token: str,
+    repo: str,
+    path: str,
+    params: Optional[Dict[str, Any]] = None,
+    operation: str = "get",
+    max_age: float = 0.0,
+) -> dict:
+    # Keyed by token as well as URL: two installations can see different
+    # contents for the same repo, and private repos must not leak across.
+    url = path if path.startswith("http") else f"{GITHUB_API}{path}"
+    key = (token_hash(token), url, tuple(sorted((params or {}).items())))
+    entry = cache.lookup(repo, key)
+
+    if entry is not None and max_age > 0 and time.monotonic() - entry["fetched_at"] < max_age:
+        cache.count("fresh")
+        return _result(entry, True)
+
+    req_headers = headers(token)
+    if entry is not None:
+        if entry["etag"]:
+            req_headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            req_headers["If-Modified-Since"] = entry["last_modified"]
+
+    with upstream_timer("github", operation) as t:
+        r = http_pool.get(url, headers=req_headers, params=params, timeout=15)
+        t.status = r.status_code
+
+    remaining = r.headers.get("X-RateLimit-Remaining")
+    if remaining is not None and remaining.isdigit():
+        cache.rate_remaining = int(remaining)
+
+    # 304s are free against the primary rate limit; serve the stored body.
+    if r.status_code == 304 and entry is not None:
+        cache.count("hits")
+        entry["fetched_at"] = time.monotonic()
+        return _result(entry, True)
+
+    cache.count("misses")
+    body = r.json() if r.content else {}
+    if not r.ok:
+        if r.status_code in (401, 403, 404, 410):
+            cache.invalidate(repo, key)
+        return {"ok": False, "status": r.status_code, "resp": body, "next": None, "cached": False}
+
+    entry = {
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+        "status": r.status_code,
+        "body": body,
+        "next": (r.links.get("next") or {}).get("url"),
+        "fetched_at": time.monotonic(),
+    }
+    if entry["etag"] or entry["last_modified"]:
+        cache.store(repo, key, entry)
+    return _result(entry, False)
@@ -1,9 +1,87 @@
-import requests
+import os
+import re
+import time
+from typing import List, Optional, Tuple
 
-def create_issue(token: str, repo_full_name: str, title: str, body: str) -> dict:
+import http_pool
 
-    url = f"https://api.github.com/repos/{repo_full_name}/issues"
-    headers = {"Authorization": f"Bearer {token}", "Accept": "application/vnd.github+json"}
+from metrics import upstream_timer
+from integrations.github_cache import GITHUB_API, cached_get, headers
+
+REPO_FRESH_SECS = float(os.getenv("GITHUB_REPO_FRESH_SECS", "60"))
+_REPO_RE = re.compile(r"[A-Za-z0-9-]{1,39}/[A-Za-z0-9._-]{1,100}")
+
+def _retry_after(r) -> Optional[float]:
+    # Secondary limits answer 403 or 429 with Retry-After; an exhausted primary
+    # limit answers 403 with remaining=0 and a reset epoch instead.
+    if r.status_code not in (403, 429):
+        return None
+    try:
+        if r.headers.get("Retry-After") is not None:
+            return float(r.headers["Retry-After"])
+        if r.headers.get("X-RateLimit-Remaining") == "0":
+            return max(1.0, float(r.headers.get("X-RateLimit-Reset", "0")) - time.time())
+    except (TypeError, ValueError):
+        return 60.0
+    return 60.0 if r.status_code == 429 else None
+
+def get_repo(token: str, repo_full_name: str, max_age: float = REPO_FRESH_SECS) -> dict:
+    return cached_get(token, repo_full_name, f"/repos/{repo_full_name}", operation="get_repo", max_age=max_age)
+
+def list_labels(token: str, repo_full_name: str) -> dict:
+    return cached_get(token, repo_full_name, f"/repos/{repo_full_name}/labels", {"per_page": 100}, operation="list_labels")
+
+def list_issues(token: str, repo_full_name: str, state: str = "open", since: Optional[str] = None, page_url: Optional[str] = None) -> dict:
+    if page_url:
+        return cached_get(token, repo_full_name, page_url, operation="list_issues")
+    params = {"state": state, "per_page": 100, "sort": "updated", "direction": "desc"}
+    if since:
+        params["since"] = since
+    return cached_get(token, repo_full_name, f"/repos/{repo_full_name}/issues", params, operation="list_issues")
+
+def validate_repo(token: str, repo_full_name: str) -> Tuple[bool, Optional[dict]]:
+    if not _REPO_RE.fullmatch(repo_full_name or ""):
+        return False, {"ok": False, "status": 400, "resp": {"error": "repo must look like 'owner/name'"}}
+
+    res = get_repo(token, repo_full_name)
+    if res["status"] in (401, 404):
+        error = "repository not found or not visible to this token" if res["status"] == 404 else "bad credentials"
+        return False, {"ok": False, "status": res["status"], "resp": {"error": error, "upstream": res["resp"]}}
+    if not res["ok"]:
+        # Rate limited or GitHub trouble: let the write decide rather than
+        # blocking on the pre-check.
+        return True, None
+
+    repo = res["resp"]
+    if repo.get("archived"):
+        return False, {"ok": False, "status": 403, "resp": {"error": "repository is archived"}}
+    if repo.get("has_issues") is False:
+        return False, {"ok": False, "status": 410, "resp": {"error": "issues are disabled for this repository"}}
+    return True, None
+
+def create_issue(
+    token: str,
+    repo_full_name: str,
+    title: str,
+    body: str,
+    validate: bool = True,
+    labels: Optional[List[str]] = None,
+) -> dict:
+
+    if validate:
+        ok, error = validate_repo(token, repo_full_name)
+        if not ok:
+            return error
+
+    url = f"{GITHUB_API}/repos/{repo_full_name}/issues"
     payload = {"title": title, "body": body}
-    r = requests.post(url, json=payload, headers=headers, timeout=15)
-    return {"ok": r.ok, "status": r.status_code, "resp": r.json() if r.content else {}}
+    if labels:
+        payload["labels"] = labels
+    with upstream_timer("github", "create_issue") as t:
+        r = http_pool.post(url, json=payload, headers=headers(token), timeout=15)
+        t.status = r.status_code
+    res = {"ok": r.ok, "status": r.status_code, "resp": r.json() if r.content else {}}
+    retry_after = _retry_after(r)
+    if retry_after is not None:
+        res["retry_after"] = retry_after
+    return res
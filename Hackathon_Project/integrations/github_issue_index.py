@@ -0,0 +1,298 @@
+import os
+import re
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+import http_pool
+from metrics import upstream_timer
+from singleflight import SingleFlight
+from token_hash import token_hash
+from integrations.github_cache import GITHUB_API, headers
+from integrations.github_client import create_issue, list_issues, validate_repo
+
+log = logging.getLogger(__name__)
+
+REFRESH_SECS = float(os.getenv("GITHUB_ISSUE_INDEX_REFRESH_SECS", "30"))
+MAX_PAGES = int(os.getenv("GITHUB_ISSUE_INDEX_MAX_PAGES", "10"))
+SIMILAR_THRESHOLD = float(os.getenv("GITHUB_SIMILAR_THRESHOLD", "0.65"))
+MAX_CANDIDATES = 5
+MAX_INDEXES = int(os.getenv("GITHUB_ISSUE_INDEX_MAX_REPOS", "128"))
+BODY_CHARS = 4000
+MAX_BODY_SHINGLES = 256
+
+# Only type markers are noise; a component scope like "ui:" or "api:" names a
+# different issue and has to stay in the hash.
+_TAG_RE = re.compile(r"^\s*(\[[^\]]*\]\s*|(bug|fix|feat|feature|chore|docs|todo|task|enhancement):\s+)+")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+def normalize_title(title: str) -> str:
+    # "[bug] Login broken" and "bug: login broken!" are the same title.
+    return " ".join(_WORD_RE.findall(_TAG_RE.sub("", title.lower()) or title.lower()))
+
+def _title_hash(title: str) -> str:
+    return hashlib.sha1(normalize_title(title).encode("utf-8")).hexdigest()
+
+def _trigrams(text: str) -> FrozenSet[str]:
+    padded = f" {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+def _body_shingles(body: str) -> FrozenSet[int]:
+    words = _WORD_RE.findall((body or "")[:BODY_CHARS].lower())
+    shingles = {hash((words[i], words[i + 1], words[i + 2])) for i in range(len(words) - 2)}
+    if len(shingles) > MAX_BODY_SHINGLES:
+        # Keep a stable min-hash style sample so large bodies stay cheap to compare.
+        shingles = set(sorted(shingles)[:MAX_BODY_SHINGLES])
+    return frozenset(shingles)
+
+def _jaccard(a: FrozenSet, b: FrozenSet) -> float:
+    if not a or not b:
+        return 0.0
+    inter = len(a & b)
+    return inter / (len(a) + len(b) - inter)
+
+class IssueIndex:
+    def __init__(self, repo: str):
+        self.repo = repo
+        self._issues: Dict[int, Dict[str, Any]] = {}
+        self._by_title: Dict[str, int] = {}
+        self._by_gram: Dict[str, Set[int]] = {}
+        self._lock = threading.Lock()
+        self.cursor = ""
+        self.built_at = 0.0
+        self.refreshed_at = 0.0
+        self.refreshes = 0
+
+    @property
+    def built(self) -> bool:
+        return self.built_at > 0
+
+    def _remove(self, number: int) -> None:
+        old = self._issues.pop(number, None)
+        if old is None:
+            return
+        if self._by_title.get(old["title_hash"]) == number:
+            del self._by_title[old["title_hash"]]
+        for gram in old["grams"]:
+            bucket = self._by_gram.get(gram)
+            if bucket is not None:
+                bucket.discard(number)
+                if not bucket:
+                    del self._by_gram[gram]
+
+    def upsert(self, issue: Dict[str, Any], advance: bool = True) -> None:
+        if "pull_request" in issue or not issue.get("number"):
+            return
+        number = issue["number"]
+        with self._lock:
+            self._remove(number)
+            if advance and issue.get("updated_at"):
+                self.cursor = max(self.cursor, issue["updated_at"])
+            if issue.get("state", "open") != "open":
+                return
+            title = issue.get("title") or ""
+            entry = {
+                "number": number,
+                "title": title,
+                "url": issue.get("html_url"),
+                "title_hash": _title_hash(title),
+                "grams": _trigrams(normalize_title(title)),
+                "shingles": _body_shingles(issue.get("body") or ""),
+            }
+            self._issues[number] = entry
+            self._by_title.setdefault(entry["title_hash"], number)
+            for gram in entry["grams"]:
+                self._by_gram.setdefault(gram, set()).add(number)
+
+    def find(self, title: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            number = self._by_title.get(_title_hash(title))
+            return self._match(self._issues[number], 1.0) if number is not None else None
+
+    def similar(self, title: str, body: str = "", threshold: float = SIMILAR_THRESHOLD) -> List[Dict[str, Any]]:
+        # Trigram overlap cannot tell "postgres 16" from "postgres 15", so these
+        # are only candidates for the caller to confirm, never a verdict.
+        with self._lock:
+            grams = _trigrams(normalize_title(title))
+            counts: Dict[int, int] = {}
+            for gram in grams:
+                for n in self._by_gram.get(gram, ()):
+                    counts[n] = counts.get(n, 0) + 1
+
+            shingles = _body_shingles(body)
+            scored = []
+            for n, shared in counts.items():
+                entry = self._issues[n]
+                title_sim = shared / (len(grams) + len(entry["grams"]) - shared)
+                # Matching bodies can lift a reworded title over the bar; differently
+                # worded bodies never pull a matching title under it.
+                score = title_sim
+                if shingles and entry["shingles"]:
+                    score = max(score, 0.7 * title_sim + 0.3 * _jaccard(shingles, entry["shingles"]))
+                if score >= threshold:
+                    scored.append((score, entry))
+            scored.sort(key=lambda pair: pair[0], reverse=True)
+            return [self._match(entry, score) for score, entry in scored[:MAX_CANDIDATES]]
+
+    @staticmethod
+    def _match(entry: Dict[str, Any], score: float) -> Dict[str, Any]:
+        return {"number": entry["number"], "title": entry["title"], "url": entry["url"], "score": round(score, 3)}
+
+    def mark_refreshed(self) -> None:
+        with self._lock:
+            self.refreshed_at = time.monotonic()
+            self.built_at = self.built_at or self.refreshed_at
+            self.refreshes += 1
+
+    def stale(self, max_age: float) -> bool:
+        return time.monotonic() - self.refreshed_at >= max_age
+
+    def __len__(self) -> int:
+        return len(self._issues)
+
+_indexes: Dict[Tuple[str, str], IssueIndex] = {}
+_lock = threading.Lock()
+_refreshes = SingleFlight()
+_creates = SingleFlight()
+
+def _key(token: str, repo: str) -> Tuple[str, str]:
+    return token_hash(token), repo.lower()
+
+def index_for(token: str, repo: str) -> IssueIndex:
+    key = _key(token, repo)
+    index = _indexes.get(key)
+    if index is None:
+        with _lock:
+            index = _indexes.get(key)
+            if index is None:
+                if len(_indexes) >= MAX_INDEXES:
+                    oldest = min(_indexes, key=lambda k: _indexes[k].refreshed_at)
+                    del _indexes[oldest]
+                index = _indexes[key] = IssueIndex(repo)
+    return index
+
+def _refresh(token: str, repo: str) -> bool:
+    # The first build walks open issues; after that a "since" cursor over all
+    # states picks up edits and closures. Both go through the conditional cache,
+    # so an unchanged repo costs a 304.
+    index = index_for(token, repo)
+    since = index.cursor if index.built else None
+    state = "all" if index.built else "open"
+    res = list_issues(token, repo, state=state, since=since)
+    for _ in range(MAX_PAGES):
+        if not res["ok"]:
+            log.debug("github issue index: list failed for %s: %s", repo, res["status"])
+            return False
+        for issue in res["resp"]:
+            index.upsert(issue)
+        if not res["next"]:
+            break
+        res = list_issues(token, repo, page_url=res["next"])
+
+    index.mark_refreshed()
+    return True
+
+def refresh(token: str, repo: str) -> bool:
+    return _refreshes.do(_key(token, repo), _refresh, token, repo)
+
+def _refresh_in_background(token: str, repo: str) -> None:
+    if _refreshes.in_flight(_key(token, repo)):
+        return
+    threading.Thread(target=refresh, args=(token, repo), name="github-issue-index", daemon=True).start()
+
+def _fresh_index(token: str, repo: str) -> IssueIndex:
+    index = index_for(token, repo)
+    if not index.built:
+        refresh(token, repo)
+    elif index.stale(REFRESH_SECS):
+        _refresh_in_background(token, repo)
+    return index
+
+def find_duplicate(token: str, repo: str, title: str) -> Optional[Dict[str, Any]]:
+    return _fresh_index(token, repo).find(title)
+
+def find_similar(token: str, repo: str, title: str, body: str = "") -> List[Dict[str, Any]]:
+    return _fresh_index(token, repo).similar(title, body)
+
+def add_comment(token: str, repo_full_name: str, number: int, body: str) -> dict:
+    url = f"{GITHUB_API}/repos/{repo_full_name}/issues/{number}/comments"
+    with upstream_timer("github", "create_comment") as t:
+        r = http_pool.post(url, json={"body": body}, headers=headers(token), timeout=15)
+        t.status = r.status_code
+    return {"ok": r.ok, "status": r.status_code, "resp": r.json() if r.content else {}}
+
+def _create_or_reuse(
+    token: str,
+    repo: str,
+    title: str,
+    body: str,
+    on_duplicate: str,
+    labels: Optional[List[str]],
+    fuzzy: bool,
+) -> dict:
+    ok, error = validate_repo(token, repo)
+    if not ok:
+        return error
+
+    # Only an identical normalized title counts as the same issue. Nothing is
+    # created either way, so neither answer is a plain 200.
+    dup = find_duplicate(token, repo, title)
+    if dup is not None:
+        if on_duplicate == "comment" and body:
+            res = add_comment(token, repo, dup["number"], body)
+            res.update(ok=False, created=False, duplicate_of=dup, commented=res["ok"])
+            if res["commented"]:
+                res["status"] = 409
+            return res
+        return {
+            "ok": False,
+            "status": 409,
+            "resp": {"number": dup["number"], "html_url": dup["url"]},
+            "created": False,
+            "duplicate_of": dup,
+            "commented": False,
+        }
+
+    if fuzzy:
+        candidates = find_similar(token, repo, title, body)
+        if candidates:
+            return {
+                "ok": False,
+                "status": 409,
+                "resp": {"error": "similar open issues exist; resend with on_duplicate='create' to open it anyway"},
+                "created": False,
+                "candidates": candidates,
+            }
+
+    res = create_issue(token, repo, title, body, validate=False, labels=labels)
+    if res["ok"]:
+        # Our own write must not move the "since" cursor past edits we have not seen.
+        index_for(token, repo).upsert(res["resp"], advance=False)
+    return res
+
+def create_issue_deduped(
+    token: str,
+    repo_full_name: str,
+    title: str,
+    body: str,
+    on_duplicate: str = "skip",
+    labels: Optional[List[str]] = None,
+    fuzzy: bool = False,
+) -> dict:
+    if on_duplicate == "create":
+        return create_issue(token, repo_full_name, title, body, labels=labels)
+    # Identical concurrent calls share one check-and-create, so a burst of
+    # retries cannot race past the index and open several issues.
+    body_hash = hashlib.sha1(body.encode("utf-8")).hexdigest()
+    key = _key(token, repo_full_name) + (_title_hash(title), body_hash, on_duplicate, fuzzy)
+    return _creates.do(key, _create_or_reuse, token, repo_full_name, title, body, on_duplicate, labels, fuzzy)
+
+def stats() -> Dict[str, Any]:
+    return {
+        "repos": len(_indexes),
+        "issues": sum(len(index) for index in list(_indexes.values())),
+        "refreshes": _refreshes.stats(),
+        "creates": _creates.stats(),
+    }
@@ -1,6 +1,15 @@
 
 import re
-import requests
+from typing import Any, Iterator, List, Optional, Tuple
+
+import http_pool
+from metrics import upstream_timer
+from integrations.notion_markdown import MAX_RICH_TEXT, MAX_TEXT_CHARS, markdown_to_blocks
+
+NOTION_API = "https://api.notion.com/v1"
+NOTION_VERSION = "2022-06-28"
+MAX_BLOCKS_PER_REQUEST = 100
+MAX_PAYLOAD_CHARS = 400_000
 
 def _extract_page_hex(s: str) -> str | None:
 
@@ -22,44 +31,121 @@ def _extract_page_hex(s: str) -> str | None:
 def _to_uuid(s: str) -> str:
     return f"{s[0:8]}-{s[8:12]}-{s[12:16]}-{s[16:20]}-{s[20:32]}"
 
-def append_to_page(bearer_token: str, page_id: str, text: str) -> dict:
+def _headers(bearer_token: str) -> dict:
+    return {
+        "Authorization": f"Bearer {bearer_token}",
+        "Content-Type": "application/json",
+        "Notion-Version": NOTION_VERSION,
+    }
+
+def _split_text(text: str, limit: int = MAX_TEXT_CHARS) -> List[str]:
+    pieces = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = text.rfind(" ", 0, limit)
+        if cut <= 0:
+            cut = limit
+        pieces.append(text[:cut])
+        text = text[cut:]
+    if text:
+        pieces.append(text)
+    return pieces
+
+def _paragraphs(segments: List[dict]) -> List[dict]:
+    return [
+        {
+            "object": "block",
+            "type": "paragraph",
+            "paragraph": {"rich_text": segments[i:i + MAX_RICH_TEXT]},
+        }
+        for i in range(0, len(segments), MAX_RICH_TEXT)
+    ]
+
+def text_to_blocks(text: str) -> List[dict]:
+    blocks: List[dict] = []
+    for para in re.split(r"\n\s*\n", text.strip()):
+        para = para.strip("\n")
+        if not para:
+            continue
+        segments = [{"type": "text", "text": {"content": piece}} for piece in _split_text(para)]
+        blocks.extend(_paragraphs(segments))
+    return blocks
+
+def _block_size(block: dict) -> int:
+    body = block.get(block.get("type", ""), {})
+    return 100 + sum(100 + len((seg.get("text") or {}).get("content", "")) for seg in body.get("rich_text", []))
+
+def _batches(blocks: List[dict]) -> Iterator[List[dict]]:
+    batch: List[dict] = []
+    size = 0
+    for block in blocks:
+        block_size = _block_size(block)
+        if batch and (len(batch) >= MAX_BLOCKS_PER_REQUEST or size + block_size > MAX_PAYLOAD_CHARS):
+            yield batch
+            batch, size = [], 0
+        batch.append(block)
+        size += block_size
+    if batch:
+        yield batch
+
+def _response_body(resp) -> Any:
+    return resp.json() if resp.headers.get("content-type", "").startswith("application/json") else {"text": resp.text}
+
+def append_batch(bearer_token: str, block_id: str, batch: List[dict]):
+    with upstream_timer("notion", "append_block_children") as t:
+        resp = http_pool.patch(
+            f"{NOTION_API}/blocks/{block_id}/children",
+            headers=_headers(bearer_token),
+            json={"children": batch},
+            timeout=20,
+        )
+        t.status = resp.status_code
+    return resp, _response_body(resp)
+
+def append_blocks(bearer_token: str, block_id: str, blocks: List[dict]) -> dict:
+    appended = 0
+    requests_made = 0
+    data: Any = {}
+    status = 200
+
+    # Children of one parent must land in order, so batches go out back to back
+    # on the pooled keep-alive connection rather than concurrently.
+    for batch in _batches(blocks):
+        resp, data = append_batch(bearer_token, block_id, batch)
+        requests_made += 1
+        status = resp.status_code
+        if not resp.ok:
+            return {"ok": False, "resp": data, "status": status, "appended_blocks": appended, "requests": requests_made}
+        appended += len(batch)
+
+    return {"ok": True, "resp": data, "status": status, "appended_blocks": appended, "requests": requests_made}
+
+def prepare_append(bearer_token: str, page_id: str, text: str, markdown: bool = False) -> Tuple[Optional[str], List[dict], Optional[dict]]:
 
     if not bearer_token:
-        return {"ok": False, "resp": {"error": "missing bearer token"}, "status": 401}
+        return None, [], {"ok": False, "resp": {"error": "missing bearer token"}, "status": 401}
 
     if not page_id or not text:
-        return {"ok": False, "resp": {"error": "missing page_id or text"}, "status": 400}
+        return None, [], {"ok": False, "resp": {"error": "missing page_id or text"}, "status": 400}
 
     hex_id = _extract_page_hex(page_id)
     if not hex_id:
-        return {"ok": False, "resp": {"error": "invalid page_id format"}, "status": 400}
+        return None, [], {"ok": False, "resp": {"error": "invalid page_id format"}, "status": 400}
 
-    block_id = _to_uuid(hex_id)
-    url = f"https://api.notion.com/v1/blocks/{block_id}/children"
+    blocks = list(markdown_to_blocks(text)) if markdown else text_to_blocks(text)
+    if not blocks:
+        return None, [], {"ok": False, "resp": {"error": "missing page_id or text"}, "status": 400}
 
-    headers = {
-        "Authorization": f"Bearer {bearer_token}",
-        "Content-Type": "application/json",
-        "Notion-Version": "2022-06-28",
-    }
-    payload = {
-        "children": [
-            {
-                "object": "block",
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": [
-                        {"type": "text", "text": {"content": text[:1900]}}
-                    ]
-                },
-            }
-        ]
-    }
+    return _to_uuid(hex_id), blocks, None
+
+def append_to_page(bearer_token: str, page_id: str, text: str, markdown: bool = False) -> dict:
+    block_id, blocks, error = prepare_append(bearer_token, page_id, text, markdown)
+    if error:
+        return error
 
     try:
-        resp = requests.patch(url, headers=headers, json=payload, timeout=20)
-        data = resp.json() if resp.headers.get("content-type", "").startswith("application/json") else {"text": resp.text}
-        return {"ok": resp.ok, "resp": data, "status": resp.status_code}
+        return append_blocks(bearer_token, block_id, blocks)
 
     except Exception as e:
         return {"ok": False, "resp": {"error": str(e)}, "status": 500}
@@ -0,0 +1,365 @@
+import os
+import time
+import bisect
+import logging
+import threading
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import http_pool
+from metrics import upstream_timer
+from singleflight import SingleFlight
+from token_bucket import retry_after_header
+from token_hash import token_hash
+from integrations import notion_queue
+from integrations.notion_client import NOTION_API, _extract_page_hex, _headers
+
+log = logging.getLogger(__name__)
+
+PAGE_SIZE = 100
+MAX_PAGES = int(os.getenv("NOTION_INDEX_MAX_PAGES", "50"))
+REFRESH_SECS = float(os.getenv("NOTION_INDEX_REFRESH_SECS", "120"))
+FULL_REFRESH_SECS = float(os.getenv("NOTION_INDEX_FULL_REFRESH_SECS", "3600"))
+MISS_REFRESH_SECS = float(os.getenv("NOTION_INDEX_MISS_REFRESH_SECS", "15"))
+IDLE_SECS = float(os.getenv("NOTION_INDEX_IDLE_SECS", "86400"))
+MAX_CANDIDATES = 10
+
+def _norm(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+def _url_key(url: str) -> Optional[str]:
+    parts = urlsplit(url.strip() if "://" in url else "https://" + url.strip())
+    host = parts.netloc.lower()
+    if not host or "." not in host:
+        return None
+    if host.startswith("www."):
+        host = host[4:]
+    return "url:" + host + parts.path.rstrip("/").lower()
+
+def _parse_aliases(raw: str) -> Dict[str, str]:
+    aliases = {}
+    for item in raw.split(","):
+        name, sep, target = item.partition("=")
+        if sep and name.strip() and target.strip():
+            aliases[_norm(name)] = target.strip()
+    return aliases
+
+ALIASES = _parse_aliases(os.getenv("NOTION_PAGE_ALIASES", ""))
+
+def _title(page: Dict[str, Any]) -> str:
+    for prop in (page.get("properties") or {}).values():
+        if prop.get("type") == "title":
+            return "".join(t.get("plain_text", "") for t in prop.get("title") or [])
+    return ""
+
+def _entry(page: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    hex_id = _extract_page_hex(page.get("id") or "")
+    if not hex_id:
+        return None
+    return {
+        "id": hex_id,
+        "title": _title(page),
+        "url": page.get("url") or "",
+        "public_url": page.get("public_url") or "",
+        "last_edited": page.get("last_edited_time") or "",
+        "archived": bool(page.get("archived") or page.get("in_trash")),
+    }
+
+def _keys(entry: Dict[str, Any]) -> List[str]:
+    keys = []
+    if entry["title"]:
+        keys.append(_norm(entry["title"]))
+    for url in (entry["url"], entry["public_url"]):
+        key = _url_key(url) if url else None
+        if key:
+            keys.append(key)
+    return keys
+
+class PageIndex:
+    def __init__(self, key: str):
+        self.key = key
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._by_key: Dict[str, FrozenSet[str]] = {}
+        self._titles: List[str] = []
+        self._titles_dirty = False
+        self._lock = threading.Lock()
+        self.cursor = ""
+        self.built_at = 0.0
+        self.full_at = 0.0
+        self.last_used = time.monotonic()
+        self.refreshes = 0
+        self.error: Optional[Dict[str, Any]] = None
+
+    @property
+    def built(self) -> bool:
+        return self.built_at > 0
+
+    # Titles are not unique, so every key maps to all pages carrying it. The
+    # sets are frozen and replaced, never mutated, so a copied map stays safe.
+    @staticmethod
+    def _put(by_id: Dict[str, Dict[str, Any]], by_key: Dict[str, FrozenSet[str]], entry: Dict[str, Any]) -> None:
+        old = by_id.pop(entry["id"], None)
+        if old is not None:
+            for key in _keys(old):
+                ids = by_key.get(key, frozenset()) - {entry["id"]}
+                if ids:
+                    by_key[key] = ids
+                else:
+                    by_key.pop(key, None)
+        if entry["archived"]:
+            return
+        by_id[entry["id"]] = entry
+        for key in _keys(entry):
+            by_key[key] = by_key.get(key, frozenset()) | {entry["id"]}
+
+    # Lookups read the maps without the lock, so updates build new maps and
+    # swap them in rather than mutating the ones readers may be holding.
+    def replace(self, entries: List[Dict[str, Any]]) -> None:
+        by_id: Dict[str, Dict[str, Any]] = {}
+        by_key: Dict[str, FrozenSet[str]] = {}
+        for entry in entries:
+            self._put(by_id, by_key, entry)
+        with self._lock:
+            self._by_id, self._by_key = by_id, by_key
+            self._titles_dirty = True
+            self.cursor = max((e["last_edited"] for e in entries), default="")
+            self.built_at = self.full_at = time.monotonic()
+            self.refreshes += 1
+            self.error = None
+
+    def merge(self, entries: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            by_id, by_key = dict(self._by_id), dict(self._by_key)
+            for entry in entries:
+                self._put(by_id, by_key, entry)
+            self._by_id, self._by_key = by_id, by_key
+            self._titles_dirty = True
+            self.cursor = max([self.cursor] + [e["last_edited"] for e in entries])
+            self.built_at = time.monotonic()
+            self.refreshes += 1
+            self.error = None
+
+    def get(self, hex_id: str) -> Optional[Dict[str, Any]]:
+        return self._by_id.get(hex_id)
+
+    @staticmethod
+    def _entries(by_id: Dict[str, Dict[str, Any]], ids: FrozenSet[str]) -> List[Dict[str, Any]]:
+        entries = [by_id[i] for i in ids if i in by_id]
+        return sorted(entries, key=lambda e: e["last_edited"], reverse=True)
+
+    def lookup(self, ref: str) -> List[Dict[str, Any]]:
+        by_id, by_key = self._by_id, self._by_key
+        url_key = _url_key(ref) if "/" in ref else None
+        ids = by_key.get(url_key) if url_key else None
+        if not ids:
+            ids = by_key.get(_norm(ref), frozenset())
+        return self._entries(by_id, ids)
+
+    def prefix(self, ref: str, limit: int = MAX_CANDIDATES) -> List[Dict[str, Any]]:
+        if self._titles_dirty:
+            with self._lock:
+                if self._titles_dirty:
+                    self._titles = sorted(k for k in self._by_key if not k.startswith("url:"))
+                    self._titles_dirty = False
+        titles, by_id, by_key = self._titles, self._by_id, self._by_key
+        needle = _norm(ref)
+        out = []
+        for i in range(bisect.bisect_left(titles, needle), len(titles)):
+            if not titles[i].startswith(needle) or len(out) >= limit:
+                break
+            out.extend(self._entries(by_id, by_key.get(titles[i], frozenset())))
+        return out[:limit]
+
+    def stale(self, max_age: float) -> bool:
+        return time.monotonic() - self.built_at >= max_age
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+def _search_error(r) -> Dict[str, Any]:
+    try:
+        body = r.json()
+    except Exception:
+        body = {"text": r.text[:200]}
+    error: Dict[str, Any] = {"status": r.status_code, "resp": body}
+    if r.status_code == 429:
+        error["retry_after"] = retry_after_header(r.headers)
+    return error
+
+def fetch_pages(token: str, since: str = "") -> Tuple[Optional[List[Dict[str, Any]]], Optional[Dict[str, Any]]]:
+    # Search results come back newest-edit first, so an incremental refresh can
+    # stop at the first page older than the cursor instead of walking everything.
+    entries: List[Dict[str, Any]] = []
+    cursor = None
+    for _ in range(MAX_PAGES):
+        body: Dict[str, Any] = {
+            "filter": {"property": "object", "value": "page"},
+            "sort": {"direction": "descending", "timestamp": "last_edited_time"},
+            "page_size": PAGE_SIZE,
+        }
+        if cursor:
+            body["start_cursor"] = cursor
+
+        # Searches share the integration's request budget with queued writes.
+        notion_queue.pace(token)
+        with upstream_timer("notion", "search") as t:
+            r = http_pool.post(f"{NOTION_API}/search", headers=_headers(token), json=body, timeout=20)
+            t.status = r.status_code
+        if not r.ok:
+            log.debug("notion page index: search failed %s %s", r.status_code, r.text[:200])
+            error = _search_error(r)
+            if "retry_after" in error:
+                notion_queue.penalize(token, error["retry_after"])
+            return None, error
+        notion_queue.recover(token)
+        data = r.json()
+
+        for page in data.get("results", []):
+            entry = _entry(page)
+            if entry is None:
+                continue
+            if since and entry["last_edited"] < since:
+                return entries, None
+            entries.append(entry)
+
+        cursor = data.get("next_cursor") if data.get("has_more") else None
+        if not cursor:
+            break
+    return entries, None
+
+_indexes: Dict[str, PageIndex] = {}
+_tokens: Dict[str, str] = {}
+_last_miss_refresh: Dict[str, float] = {}
+_lock = threading.Lock()
+_builds = SingleFlight()
+_refresher: Optional[threading.Thread] = None
+
+def index_for(key: str) -> PageIndex:
+    index = _indexes.get(key)
+    if index is None:
+        with _lock:
+            index = _indexes.setdefault(key, PageIndex(key))
+    return index
+
+def _refresh(key: str, token: str) -> bool:
+    index = index_for(key)
+    full = not index.built or time.monotonic() - index.full_at >= FULL_REFRESH_SECS
+    try:
+        entries, error = fetch_pages(token, "" if full else index.cursor)
+    except Exception as e:
+        log.debug("notion page index: refresh failed: %s", e)
+        entries, error = None, {"status": 502, "resp": {"error": str(e)}}
+    if entries is None:
+        index.error = error
+        return False
+    if full:
+        index.replace(entries)
+    else:
+        index.merge(entries)
+    return True
+
+def refresh(token: str) -> bool:
+    key = token_hash(token)
+    _tokens[key] = token
+    return _builds.do(key, _refresh, key, token)
+
+def _refresh_loop() -> None:
+    while True:
+        time.sleep(max(1.0, REFRESH_SECS / 4))
+        now = time.monotonic()
+        for key, index in list(_indexes.items()):
+            if now - index.last_used >= IDLE_SECS:
+                with _lock:
+                    _indexes.pop(key, None)
+                    _tokens.pop(key, None)
+                continue
+            token = _tokens.get(key)
+            if token and index.built and index.stale(REFRESH_SECS):
+                try:
+                    _builds.do(key, _refresh, key, token)
+                except Exception as e:
+                    log.debug("notion page index: background refresh failed: %s", e)
+
+def _ensure_refresher() -> None:
+    global _refresher
+    if _refresher is not None and _refresher.is_alive():
+        return
+    with _lock:
+        if _refresher is None or not _refresher.is_alive():
+            _refresher = threading.Thread(target=_refresh_loop, name="notion-page-index", daemon=True)
+            _refresher.start()
+
+def _refresh_in_background(key: str, token: str) -> None:
+    if _builds.in_flight(key):
+        return
+    now = time.monotonic()
+    if now - _last_miss_refresh.get(key, 0.0) < MISS_REFRESH_SECS:
+        return
+    _last_miss_refresh[key] = now
+    threading.Thread(target=_builds.do, args=(key, _refresh, key, token), name="notion-page-index-miss", daemon=True).start()
+
+def prime(token: str) -> PageIndex:
+    key = token_hash(token)
+    _tokens[key] = token
+    _ensure_refresher()
+    index = index_for(key)
+    index.last_used = time.monotonic()
+    if not index.built:
+        _refresh_in_background(key, token)
+    return index
+
+def _not_ready(index: PageIndex) -> dict:
+    error = index.error
+    if error is None or error["status"] == 429:
+        return {"ok": False, "resp": {"error": "Notion page index is still loading; retry shortly."}, "status": 503}
+    # A token without search access will never finish building; say why.
+    status = error["status"] if error["status"] in (401, 403) else 502
+    return {
+        "ok": False,
+        "resp": {"error": "Notion search failed; pass a page id or URL instead.", "upstream": error["resp"]},
+        "status": status,
+    }
+
+def resolve(token: str, ref: str) -> Tuple[Optional[str], Optional[dict]]:
+    ref = (ref or "").strip()
+    ref = ALIASES.get(_norm(ref), ref)
+
+    hex_id = _extract_page_hex(ref)
+    if hex_id:
+        return hex_id, None
+
+    index = prime(token)
+    if not index.built:
+        return None, _not_ready(index)
+
+    # An exact title shared by several pages is as ambiguous as a prefix; since
+    # the caller is about to write, make them pick rather than guess.
+    matches = index.lookup(ref)
+    if len(matches) == 1:
+        return matches[0]["id"], None
+    if not matches:
+        matches = index.prefix(ref)
+        if len(matches) == 1:
+            return matches[0]["id"], None
+
+    # Unknown names may be pages created since the last refresh.
+    _refresh_in_background(index.key, token)
+    if matches:
+        return None, {
+            "ok": False,
+            "resp": {"error": f"'{ref}' matches several Notion pages.", "candidates": [{"id": m["id"], "title": m["title"]} for m in matches]},
+            "status": 409,
+        }
+    return None, {"ok": False, "resp": {"error": f"No Notion page matches '{ref}'."}, "status": 404}
+
+def search(token: str, prefix: str, limit: int = MAX_CANDIDATES) -> List[Dict[str, Any]]:
+    index = prime(token)
+    return [{"id": e["id"], "title": e["title"], "url": e["url"]} for e in index.prefix(prefix, limit)]
+
+def stats() -> Dict[str, Any]:
+    return {
+        "workspaces": len(_indexes),
+        "pages": sum(len(index) for index in list(_indexes.values())),
+        "refreshes": sum(index.refreshes for index in list(_indexes.values())),
+        "builds": _builds.stats(),
+    }
@@ -0,0 +1,288 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+MAX_TEXT_CHARS = 2000
+MAX_RICH_TEXT = 100
+
+_CODE_LANGUAGES = {
+    "bash": "bash", "sh": "shell", "shell": "shell", "c": "c", "cpp": "c++", "c++": "c++",
+    "css": "css", "go": "go", "html": "html", "java": "java", "js": "javascript",
+    "javascript": "javascript", "json": "json", "markdown": "markdown", "md": "markdown",
+    "py": "python", "python": "python", "ruby": "ruby", "rust": "rust", "sql": "sql",
+    "ts": "typescript", "typescript": "typescript", "yaml": "yaml", "yml": "yaml",
+}
+
+_MARKERS = ("**", "__", "~~", "*", "_")
+_ANNOTATION = {"**": "bold", "__": "bold", "*": "italic", "_": "italic", "~~": "strikethrough"}
+
+# str.find with a per-character memo: a search never rescans text an earlier
+# search for the same character already covered, which keeps tokenizing linear.
+class _Finder:
+    __slots__ = ("text", "_memo")
+
+    def __init__(self, text: str):
+        self.text = text
+        self._memo: Dict[str, int] = {}
+
+    def next(self, ch: str, start: int) -> int:
+        pos = self._memo.get(ch)
+        if pos is None or (pos != -1 and pos < start):
+            pos = self.text.find(ch, start)
+            self._memo[ch] = pos
+        return pos
+
+def _tokenize(line: str) -> List[list]:
+    tokens: List[list] = []
+    find = _Finder(line)
+    buf_start = 0
+    i = 0
+    n = len(line)
+
+    def flush(end: int) -> None:
+        if end > buf_start:
+            tokens.append(["text", line[buf_start:end]])
+
+    while i < n:
+        ch = line[i]
+        if ch == "\\" and i + 1 < n:
+            flush(i)
+            tokens.append(["text", line[i + 1]])
+            i += 2
+            buf_start = i
+            continue
+
+        if ch == "`":
+            close = find.next("`", i + 1)
+            if close != -1:
+                flush(i)
+                tokens.append(["code", line[i + 1:close]])
+                i = close + 1
+                buf_start = i
+                continue
+
+        elif ch == "[":
+            close = find.next("]", i + 1)
+            if close != -1 and close + 1 < n and line[close + 1] == "(":
+                end = find.next(")", close + 2)
+                if end != -1:
+                    flush(i)
+                    tokens.append(["link", line[i + 1:close], line[close + 2:end].strip()])
+                    i = end + 1
+                    buf_start = i
+                    continue
+
+        elif ch in "*_~":
+            marker = None
+            for m in _MARKERS:
+                if line.startswith(m, i):
+                    marker = m
+                    break
+            if marker and marker[0] == "_":
+                prev_alnum = i > 0 and line[i - 1].isalnum()
+                next_alnum = i + len(marker) < n and line[i + len(marker)].isalnum()
+                if prev_alnum and next_alnum:
+                    marker = None
+            if marker:
+                flush(i)
+                tokens.append(["mark", marker])
+                i += len(marker)
+                buf_start = i
+                continue
+
+        i += 1
+
+    flush(n)
+    return tokens
+
+def _pair_markers(tokens: List[list]) -> None:
+    open_at: Dict[str, int] = {}
+    paired = set()
+    for idx, tok in enumerate(tokens):
+        if tok[0] != "mark":
+            continue
+        marker = tok[1]
+        start = open_at.pop(marker, None)
+        if start is None:
+            open_at[marker] = idx
+        else:
+            paired.add(start)
+            paired.add(idx)
+    for idx, tok in enumerate(tokens):
+        if tok[0] == "mark" and idx not in paired:
+            tok[0] = "text"
+
+def _segment(content: str, annotations: Tuple[str, ...], url: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    for start in range(0, len(content), MAX_TEXT_CHARS):
+        text: Dict[str, Any] = {"content": content[start:start + MAX_TEXT_CHARS]}
+        if url:
+            text["link"] = {"url": url}
+        seg: Dict[str, Any] = {"type": "text", "text": text}
+        if annotations:
+            seg["annotations"] = {name: True for name in annotations}
+        yield seg
+
+def _is_web_url(url: str) -> bool:
+    scheme, sep, rest = url.partition("://")
+    return bool(sep) and scheme.lower() in ("http", "https") and bool(rest) and " " not in url
+
+def inline_to_rich_text(line: str) -> List[Dict[str, Any]]:
+    tokens = _tokenize(line)
+    _pair_markers(tokens)
+
+    active: Dict[str, bool] = {}
+    out: List[Dict[str, Any]] = []
+    pending: List[str] = []
+    pending_ann: Tuple[str, ...] = ()
+
+    def current() -> Tuple[str, ...]:
+        return tuple(sorted({_ANNOTATION[m] for m, on in active.items() if on}))
+
+    def flush() -> None:
+        if pending:
+            out.extend(_segment("".join(pending), pending_ann))
+            pending.clear()
+
+    for tok in tokens:
+        kind = tok[0]
+        if kind == "mark":
+            active[tok[1]] = not active.get(tok[1], False)
+            continue
+
+        ann = current()
+        if kind == "text":
+            if ann != pending_ann:
+                flush()
+                pending_ann = ann
+            pending.append(tok[1])
+        elif kind == "code":
+            flush()
+            out.extend(_segment(tok[1], tuple(sorted(ann + ("code",)))))
+        elif kind == "link":
+            flush()
+            label, url = tok[1], tok[2]
+            if _is_web_url(url):
+                out.extend(_segment(label or url, ann, url))
+            else:
+                # Notion rejects relative and anchor links with a validation
+                # error that would fail the whole batch; keep them as text.
+                out.extend(_segment(f"{label} ({url})" if label and url and label != url else label or url, ann))
+
+    flush()
+    return out
+
+def _blocks(block_type: str, rich_text: List[Dict[str, Any]], **extra) -> Iterator[Dict[str, Any]]:
+    if not rich_text:
+        rich_text = [{"type": "text", "text": {"content": ""}}]
+    for start in range(0, len(rich_text), MAX_RICH_TEXT):
+        body: Dict[str, Any] = {"rich_text": rich_text[start:start + MAX_RICH_TEXT]}
+        body.update(extra)
+        yield {"object": "block", "type": block_type, block_type: body}
+
+def _heading_level(line: str) -> int:
+    level = 0
+    while level < len(line) and line[level] == "#":
+        level += 1
+    if 0 < level <= 6 and (level == len(line) or line[level] == " "):
+        return level
+    return 0
+
+def _ordered_prefix(line: str) -> int:
+    i = 0
+    while i < len(line) and line[i].isdigit():
+        i += 1
+    if 0 < i <= 9 and line.startswith(". ", i):
+        return i + 2
+    return 0
+
+def _lines(source: Union[str, Iterable[str]]) -> Iterator[str]:
+    if isinstance(source, str):
+        yield from source.splitlines()
+        return
+    carry: List[str] = []
+    for chunk in source:
+        if "\n" not in chunk:
+            carry.append(chunk)
+            continue
+        first, *rest = chunk.split("\n")
+        carry.append(first)
+        yield "".join(carry)
+        carry = [rest.pop()]
+        yield from rest
+    if any(carry):
+        yield "".join(carry)
+
+def markdown_to_blocks(source: Union[str, Iterable[str]]) -> Iterator[Dict[str, Any]]:
+    paragraph: List[str] = []
+    code: Optional[List[str]] = None
+    code_lang = ""
+
+    def flush_paragraph() -> Iterator[Dict[str, Any]]:
+        if paragraph:
+            rich: List[Dict[str, Any]] = []
+            for n, text in enumerate(paragraph):
+                if n:
+                    rich.append({"type": "text", "text": {"content": "\n"}})
+                rich.extend(inline_to_rich_text(text))
+            paragraph.clear()
+            yield from _blocks("paragraph", rich)
+
+    for raw in _lines(source):
+        line = raw.rstrip("\r")
+        stripped = line.strip()
+
+        if code is not None:
+            if stripped.startswith("```"):
+                content = "\n".join(code)
+                yield from _blocks("code", list(_segment(content, ())), language=_CODE_LANGUAGES.get(code_lang, "plain text"))
+                code = None
+            else:
+                code.append(line)
+            continue
+
+        if stripped.startswith("```"):
+            yield from flush_paragraph()
+            code = []
+            code_lang = stripped[3:].strip().lower()
+            continue
+
+        if not stripped:
+            yield from flush_paragraph()
+            continue
+
+        level = _heading_level(stripped)
+        if level:
+            yield from flush_paragraph()
+            kind = f"heading_{min(level, 3)}"
+            yield from _blocks(kind, inline_to_rich_text(stripped[level:].strip().rstrip("#").strip()))
+            continue
+
+        if stripped in ("---", "***", "___"):
+            yield from flush_paragraph()
+            yield {"object": "block", "type": "divider", "divider": {}}
+            continue
+
+        if stripped[:2] in ("- ", "* ", "+ ", "• "):
+            yield from flush_paragraph()
+            item = stripped[2:]
+            box = item[:4].lower()
+            if box in ("[ ] ", "[x] ") or item.lower() in ("[ ]", "[x]"):
+                yield from _blocks("to_do", inline_to_rich_text(item[4:]), checked=box.startswith("[x"))
+            else:
+                yield from _blocks("bulleted_list_item", inline_to_rich_text(item))
+            continue
+
+        prefix = _ordered_prefix(stripped)
+        if prefix:
+            yield from flush_paragraph()
+            yield from _blocks("numbered_list_item", inline_to_rich_text(stripped[prefix:]))
+            continue
+
+        if stripped.startswith(">"):
+            yield from flush_paragraph()
+            yield from _blocks("quote", inline_to_rich_text(stripped[1:].strip()))
+            continue
+
+        paragraph.append(stripped)
+
+    if code is not None:
+        yield from _blocks("code", list(_segment("\n".join(code), ())), language=_CODE_LANGUAGES.get(code_lang, "plain text"))
+    yield from flush_paragraph()
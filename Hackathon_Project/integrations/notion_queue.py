@@ -0,0 +1,247 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+from ttl_cache import TTLCache
+from integrations.notion_client import _batches, append_batch, prepare_append
+from token_bucket import TokenBucket, retry_after_header
+from token_hash import token_hash
+
+log = logging.getLogger(__name__)
+
+# Notion documents an average of three requests per second per integration.
+RATE_PER_SEC = float(os.getenv("NOTION_RATE_PER_SEC", "3"))
+BURST = float(os.getenv("NOTION_RATE_BURST", "3"))
+MAX_RETRIES = max(0, int(os.getenv("NOTION_QUEUE_MAX_RETRIES", "5")))
+MAX_RETRY_AFTER_SECS = float(os.getenv("NOTION_QUEUE_MAX_RETRY_AFTER_SECS", "60"))
+IDLE_SECS = float(os.getenv("NOTION_QUEUE_IDLE_SECS", "60"))
+JOB_TTL_SECS = float(os.getenv("NOTION_QUEUE_JOB_TTL_SECS", "600"))
+
+_REQUESTS = metrics.REGISTRY.register(metrics.Counter(
+    "notion_queue_requests_total", "Notion append requests sent by the write queue, by outcome.", ("outcome",),
+))
+_JOBS = metrics.REGISTRY.register(metrics.Counter(
+    "notion_queue_jobs_total", "Notion appends completed by the write queue, by outcome.", ("outcome",),
+))
+
+class Job:
+    __slots__ = ("id", "block_id", "blocks", "on_done", "result", "done", "merged")
+
+    def __init__(self, block_id: str, blocks: List[dict], on_done: Optional[Callable[[dict], None]] = None):
+        self.id = uuid.uuid4().hex
+        self.block_id = block_id
+        self.blocks = blocks
+        self.on_done = on_done
+        self.result: Optional[dict] = None
+        self.done = threading.Event()
+        self.merged = 0
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[dict]:
+        self.done.wait(timeout)
+        return self.result
+
+    def finish(self, result: dict) -> None:
+        self.result = result
+        # Finished jobs linger in _jobs for status polls; the payload is not needed.
+        self.blocks = None
+        self.done.set()
+        _JOBS.inc("ok" if result.get("ok") else "failed")
+        if self.on_done is not None:
+            try:
+                self.on_done(result)
+            except Exception as e:
+                log.debug("notion queue: completion callback failed: %s", e)
+
+    def status(self) -> Dict[str, Any]:
+        if not self.done.is_set():
+            return {"job_id": self.id, "state": "queued"}
+        return {"job_id": self.id, "state": "done", "result": self.result}
+
+class TokenQueue:
+    def __init__(self, key: str, token: str):
+        self.key = key
+        self.token = token
+        self._pending: "OrderedDict[str, List[Job]]" = OrderedDict()
+        self._cond = threading.Condition()
+        self.sent = 0
+        self.throttled = 0
+        threading.Thread(target=self._run, name="notion-write-queue", daemon=True).start()
+
+    def put(self, job: Job) -> None:
+        with self._cond:
+            self._pending.setdefault(job.block_id, []).append(job)
+            self._cond.notify()
+
+    def depth(self) -> int:
+        with self._cond:
+            return sum(len(jobs) for jobs in self._pending.values())
+
+    def _next(self) -> Optional[Tuple[str, List[Job]]]:
+        with self._cond:
+            while not self._pending:
+                if not self._cond.wait(IDLE_SECS):
+                    break
+            if self._pending:
+                return self._pending.popitem(last=False)
+
+        # Retire under the registry lock so a concurrent submit either lands
+        # before we look again or creates a fresh queue after we are gone.
+        with _lock:
+            with self._cond:
+                if self._pending:
+                    return self._pending.popitem(last=False)
+                if _queues.get(self.key) is self:
+                    del _queues[self.key]
+                return None
+
+    def _run(self) -> None:
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            block_id, jobs = item
+            try:
+                self._flush(block_id, jobs)
+            except Exception as e:
+                log.exception("notion queue: flush failed for %s", block_id)
+                result = {"ok": False, "resp": {"error": str(e)}, "status": 500, "appended_blocks": 0}
+                for job in jobs:
+                    if not job.done.is_set():
+                        job.finish(result)
+
+    def _send(self, block_id: str, batch: List[dict]):
+        for attempt in range(MAX_RETRIES + 1):
+            _pace(self.key)
+            resp, data = append_batch(self.token, block_id, batch)
+            self.sent += 1
+            if resp.status_code != 429 or attempt == MAX_RETRIES:
+                return resp, data, attempt + 1
+            retry_after = min(retry_after_header(resp.headers), MAX_RETRY_AFTER_SECS)
+            self.throttled += 1
+            _REQUESTS.inc("throttled")
+            log.debug("notion queue: 429 on %s, backing off %.1fs", block_id, retry_after)
+            _penalize(self.key, retry_after)
+
+    def _flush(self, block_id: str, jobs: List[Job]) -> None:
+        # Appends queued for the same page while we were busy go out together:
+        # their blocks are concatenated in arrival order and re-batched.
+        blocks = [block for job in jobs for block in job.blocks]
+        appended = 0
+        requests_made = 0
+        data: Any = {}
+        status = 200
+        ok = True
+
+        for batch in _batches(blocks):
+            resp, data, attempts = self._send(block_id, batch)
+            requests_made += attempts
+            status = resp.status_code
+            if not resp.ok:
+                _REQUESTS.inc("failed")
+                ok = False
+                break
+            _REQUESTS.inc("ok")
+            _recover(self.key)
+            appended += len(batch)
+
+        start = 0
+        for job in jobs:
+            job.merged = len(jobs)
+            end = start + len(job.blocks)
+            landed = min(max(appended - start, 0), len(job.blocks))
+            job_ok = ok or end <= appended
+            job.finish({
+                "ok": job_ok,
+                "resp": data,
+                "status": 200 if job_ok else status,
+                "appended_blocks": landed,
+                "requests": requests_made,
+                "merged": len(jobs),
+                "job_id": job.id,
+            })
+            start = end
+
+_queues: Dict[str, TokenQueue] = {}
+_jobs = TTLCache(maxsize=10_000, ttl=JOB_TTL_SECS)
+_lock = threading.Lock()
+# One bucket per integration token, shared by the write queue and any other
+# Notion calls made with that token, since they draw on the same limit.
+_buckets: Dict[str, TokenBucket] = {}
+_bucket_lock = threading.Lock()
+
+def _bucket(key: str) -> TokenBucket:
+    bucket = _buckets.get(key)
+    if bucket is None:
+        bucket = _buckets.setdefault(key, TokenBucket(RATE_PER_SEC * 60.0, BURST))
+    return bucket
+
+def _pace(key: str) -> None:
+    with _bucket_lock:
+        _, wait = _bucket(key).reserve(time.monotonic(), float("inf"))
+    if wait:
+        time.sleep(wait)
+
+def _penalize(key: str, retry_after: float) -> None:
+    with _bucket_lock:
+        _bucket(key).penalize(time.monotonic(), retry_after)
+
+def _recover(key: str) -> None:
+    with _bucket_lock:
+        _bucket(key).recover()
+
+def pace(bearer_token: str) -> None:
+    _pace(token_hash(bearer_token))
+
+def penalize(bearer_token: str, retry_after: float) -> None:
+    _penalize(token_hash(bearer_token), retry_after)
+
+def recover(bearer_token: str) -> None:
+    _recover(token_hash(bearer_token))
+
+def submit(bearer_token: str, block_id: str, blocks: List[dict], on_done: Optional[Callable[[dict], None]] = None) -> Job:
+    job = Job(block_id, blocks, on_done)
+    _jobs.set(job.id, job)
+    key = token_hash(bearer_token)
+    with _lock:
+        queue = _queues.get(key)
+        if queue is None:
+            queue = _queues[key] = TokenQueue(key, bearer_token)
+        queue.put(job)
+    return job
+
+def enqueue_append(
+    bearer_token: str,
+    page_id: str,
+    text: str,
+    markdown: bool = False,
+    on_done: Optional[Callable[[dict], None]] = None,
+) -> Tuple[Optional[Job], Optional[dict]]:
+    block_id, blocks, error = prepare_append(bearer_token, page_id, text, markdown)
+    if error:
+        return None, error
+    return submit(bearer_token, block_id, blocks, on_done), None
+
+def job_status(job_id: str) -> Optional[Dict[str, Any]]:
+    job = _jobs.get(job_id)
+    return job.status() if job is not None else None
+
+def stats() -> Dict[str, Any]:
+    queues = list(_queues.values())
+    return {
+        "queues": len(queues),
+        "pending": sum(q.depth() for q in queues),
+        "sent": sum(q.sent for q in queues),
+        "throttled": sum(q.throttled for q in queues),
+        "jobs": _jobs.stats(),
+    }
+
+@metrics.REGISTRY.collector
+def _queue_samples():
+    st = stats()
+    yield "notion_queue_workers", "gauge", "Integration tokens with an active Notion write worker.", {}, st["queues"]
+    yield "notion_queue_pending", "gauge", "Notion appends waiting in the write queue.", {}, st["pending"]
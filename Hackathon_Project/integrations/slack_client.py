@@ -1,28 +1,101 @@
+import os
 import re
 import time
+import logging
+import threading
 import requests
-from typing import Optional, Dict, Any, Union, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Iterable, Union, List, Tuple
+
+import http_pool
+import metrics
+from metrics import upstream_timer
+from ttl_cache import TTLCache
+from token_bucket import retry_after_header
+from token_hash import token_hash
+from integrations import slack_index
+from integrations.slack_index import AUTH_ERRORS
+from integrations.slack_ratelimit import limiter
+
+log = logging.getLogger(__name__)
 
 SLACK_API = "https://slack.com/api"
 DEFAULT_TIMEOUT = 20
+UPDATE_INTERVAL_SECS = float(os.getenv("SLACK_UPDATE_INTERVAL_SECS", "1.5"))
+FINAL_UPDATE_MAX_WAIT_SECS = float(os.getenv("SLACK_FINAL_UPDATE_MAX_WAIT_SECS", "10"))
+FINAL_UPDATE_RETRIES = int(os.getenv("SLACK_FINAL_UPDATE_RETRIES", "3"))
+
+_auth_cache = TTLCache(
+    maxsize=int(os.getenv("SLACK_AUTH_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("SLACK_AUTH_TTL_SECS", "600")),
+)
+metrics.register_cache("slack_auth", _auth_cache.stats)
+
+_broadcast_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("SLACK_BROADCAST_WORKERS", "8")),
+    thread_name_prefix="slack-broadcast",
+)
 
 def _api(token: str, method: str, payload: dict, timeout: int = DEFAULT_TIMEOUT) -> requests.Response:
 
-    return requests.post(
-        f"{SLACK_API}/{method}",
-        headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json; charset=utf-8"},
-        json=payload,
-        timeout=timeout,
-    )
+    with upstream_timer("slack", method) as t:
+        r = http_pool.post(
+            f"{SLACK_API}/{method}",
+            headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json; charset=utf-8"},
+            json=payload,
+            timeout=timeout,
+        )
+        t.status = r.status_code
+    return r
 
-def _auth_test(token: str) -> Dict[str, Any]:
-    r = _api(token, "auth.test", {})
+def _note_auth_error(token: str, j: Dict[str, Any]) -> None:
+    if j.get("error") in AUTH_ERRORS:
+        _auth_cache.invalidate(token_hash(token))
+        slack_index.forget_token(token)
+
+def _call(
+    token: str,
+    method: str,
+    payload: dict,
+    workspace: Optional[str] = None,
+    channel: Optional[str] = None,
+    max_wait: Optional[float] = None,
+) -> Dict[str, Any]:
+    workspace = workspace or token_hash(token)
+    granted, wait = limiter.reserve(workspace, method, channel, max_wait)
+    if not granted:
+        return {"ok": False, "status": 429, "resp": {"error": "rate_limited"}, "retry_after": round(wait, 3), "sent": False}
+    if wait:
+        time.sleep(wait)
+
+    r = _api(token, method, payload)
     try:
         j = r.json()
     except Exception:
         j = {}
 
-    j["_http_status"] = r.status_code
+    if r.status_code == 429:
+        retry_after = retry_after_header(r.headers)
+        limiter.penalize(workspace, method, retry_after, channel)
+        return {"ok": False, "status": 429, "resp": j or {"error": "rate_limited"}, "retry_after": retry_after, "sent": True}
+
+    limiter.recover(workspace, method, channel)
+    _note_auth_error(token, j)
+    return {"ok": bool(j.get("ok")), "status": r.status_code, "resp": j}
+
+def _auth_test(token: str) -> Dict[str, Any]:
+    key = token_hash(token)
+    cached = _auth_cache.get(key)
+    if cached is not None:
+        return dict(cached)
+
+    res = _call(token, "auth.test", {}, workspace=key)
+    j = dict(res["resp"])
+    j["_http_status"] = res["status"]
+    if "retry_after" in res:
+        j["retry_after"] = res["retry_after"]
+    if j.get("ok"):
+        _auth_cache.set(key, {k: j.get(k) for k in ("ok", "team_id", "team", "user_id", "user", "bot_id", "url", "_http_status")})
     return j
 
 def _normalize_channel(value: str) -> str:
@@ -39,78 +112,57 @@ def _normalize_channel(value: str) -> str:
         return value
     return value
 
-def _lookup_channel_id(token: str, channel: str) -> Optional[str]:
+def _lookup_channel_id(token: str, channel: str, team_id: Optional[str] = None) -> Optional[str]:
 
     if channel and channel.startswith("C") and len(channel) >= 9:
         return channel
     if not channel.startswith("#"):
         return channel
-    name = channel[1:]
-    cursor = None
-    for _ in range(20):
-        r = requests.get(
-            f"{SLACK_API}/conversations.list",
-            headers={"Authorization": f"Bearer {token}"},
-            params={"exclude_archived": "true", "limit": 1000, **({"cursor": cursor} if cursor else {})},
-            timeout=DEFAULT_TIMEOUT,
-        )
-        data = r.json()
-        for ch in data.get("channels", []):
-            if ch.get("name") == name:
-                return ch.get("id")
-        cursor = (data.get("response_metadata") or {}).get("next_cursor") or None
-        if not cursor:
-            break
-    return None
-
-def _join_if_needed(token: str, channel_id: str) -> Optional[Dict[str, Any]]:
-
-    r = _api(token, "conversations.join", {"channel": channel_id})
-    try:
-        j = r.json()
-    except Exception:
-        j = {}
+    entry = slack_index.resolve(token, team_id or token_hash(token), channel[1:])
+    return entry.get("id") if entry else None
 
-    return j
+def _join_if_needed(token: str, channel_id: str, workspace: Optional[str] = None) -> Optional[Dict[str, Any]]:
 
-def _post_with_retry(token: str, payload: dict, retries: int = 2) -> Dict[str, Any]:
-    for attempt in range(retries + 1):
-        r = _api(token, "chat.postMessage", payload)
-        status = r.status_code
-        try:
-            j = r.json()
-        except Exception:
-            j = {}
-
-        if status == 429:
-            wait = int(r.headers.get("Retry-After", "1"))
-            time.sleep(wait)
-            continue
+    return _call(token, "conversations.join", {"channel": channel_id}, workspace)["resp"]
 
-        return {"ok": bool(j.get("ok")), "status": status, "resp": j}
-    return {"ok": False, "status": 429, "resp": {"error": "rate_limited"}}
-
-def post_summary_to_slack(
-    token: str,
-    channel: str,
-    text: str,
-    *,
-    blocks: Optional[List[Dict[str, Any]]] = None,
-    thread_ts: Optional[str] = None,
-    unfurl_links: bool = False,
-    link_names: bool = True,
-) -> Dict[str, Any]:
+def _post_with_retry(token: str, payload: dict, retries: int = 2, workspace: Optional[str] = None) -> Dict[str, Any]:
+    for attempt in range(retries + 1):
+        result = _call(token, "chat.postMessage", payload, workspace, channel=payload.get("channel"))
+        retry = (
+            result["status"] == 429
+            and result.get("sent")
+            and result.get("retry_after", 0) <= limiter.max_pace_secs
+            and attempt < retries
+        )
+        if not retry:
+            result.pop("sent", None)
+            return result
+    return result
 
+def _authorize(token: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
     if not token or not token.startswith("xox"):
-        return {"ok": False, "status": 401, "resp": {"error": "invalid_auth", "message": "Missing or bad Slack token"}}
+        return None, {"ok": False, "status": 401, "resp": {"error": "invalid_auth", "message": "Missing or bad Slack token"}}
 
     auth = _auth_test(token)
     if not auth.get("ok"):
-        return {"ok": False, "status": auth.get("_http_status", 401), "resp": auth}
-
-    norm = _normalize_channel(channel)
-    channel_id = _lookup_channel_id(token, norm) or norm
+        # auth.test reports bad tokens as HTTP 200 with ok:false.
+        status = auth.pop("_http_status", 401)
+        if status < 400:
+            status = 401 if auth.get("error") in AUTH_ERRORS else 400
+        res = {"ok": False, "status": status, "resp": auth}
+        if "retry_after" in auth:
+            res["retry_after"] = auth["retry_after"]
+        return None, res
+    return auth, None
 
+def _build_payload(
+    channel_id: str,
+    text: str,
+    blocks: Optional[List[Dict[str, Any]]],
+    thread_ts: Optional[str],
+    unfurl_links: bool,
+    link_names: bool,
+) -> Dict[str, Any]:
     payload = {
         "channel": channel_id,
         "text": text or "",
@@ -125,13 +177,210 @@ def post_summary_to_slack(
 
     if thread_ts:
         payload["thread_ts"] = thread_ts
+    return payload
+
+def _join(token: str, workspace: str, channel_id: str) -> bool:
+    j = _join_if_needed(token, channel_id, workspace) or {}
+    if j.get("ok"):
+        slack_index.index_for(workspace).mark_member(channel_id)
+        return True
+    return False
+
+def _deliver(token: str, workspace: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    channel_id = payload["channel"]
+    index = slack_index.index_for(workspace)
+    joinable = isinstance(channel_id, str) and channel_id.startswith("C")
 
-    result = _post_with_retry(token, payload)
+    if joinable:
+        entry = index.get(channel_id)
+        if index.is_member(channel_id) is False and not entry.get("is_private") and not entry.get("is_archived"):
+            _join(token, workspace, channel_id)
+
+    result = _post_with_retry(token, payload, workspace=workspace)
 
     if result["resp"].get("error") in ("not_in_channel", "channel_not_found", "is_archived"):
-        if isinstance(channel_id, str) and channel_id.startswith("C"):
-            _join_if_needed(token, channel_id)
-            result = _post_with_retry(token, payload)
+        if joinable:
+            index.mark_member(channel_id, False)
+            if _join(token, workspace, channel_id):
+                result = _post_with_retry(token, payload, workspace=workspace)
+    elif result.get("ok") and joinable:
+        index.mark_member(channel_id)
 
     result["ok"] = bool(result.get("ok"))
     return result
+
+def post_summary_to_slack(
+    token: str,
+    channel: str,
+    text: str,
+    *,
+    blocks: Optional[List[Dict[str, Any]]] = None,
+    thread_ts: Optional[str] = None,
+    unfurl_links: bool = False,
+    link_names: bool = True,
+) -> Dict[str, Any]:
+
+    auth, denied = _authorize(token)
+    if denied:
+        return denied
+
+    workspace = auth.get("team_id") or token_hash(token)
+    slack_index.prime(token, workspace)
+
+    norm = _normalize_channel(channel)
+    channel_id = _lookup_channel_id(token, norm, auth.get("team_id")) or norm
+
+    payload = _build_payload(channel_id, text, blocks, thread_ts, unfurl_links, link_names)
+    return _deliver(token, workspace, payload)
+
+def broadcast_summary_to_slack(
+    token: str,
+    channels: List[str],
+    text: str,
+    *,
+    blocks: Optional[List[Dict[str, Any]]] = None,
+    unfurl_links: bool = False,
+    link_names: bool = True,
+) -> Dict[str, Any]:
+
+    auth, denied = _authorize(token)
+    if denied:
+        return denied
+
+    workspace = auth.get("team_id") or token_hash(token)
+    slack_index.prime(token, workspace)
+
+    targets: List[Tuple[str, str]] = []
+    seen = set()
+    for channel in channels:
+        norm = _normalize_channel((channel or "").strip())
+        if not norm:
+            continue
+        channel_id = _lookup_channel_id(token, norm, auth.get("team_id")) or norm
+        if channel_id in seen:
+            continue
+        seen.add(channel_id)
+        targets.append((channel, channel_id))
+
+    if not targets:
+        return {"ok": False, "status": 400, "resp": {"error": "no_channels"}, "results": []}
+
+    futures = [
+        _broadcast_pool.submit(
+            _deliver, token, workspace, _build_payload(channel_id, text, blocks, None, unfurl_links, link_names)
+        )
+        for _, channel_id in targets
+    ]
+
+    results = []
+    for (channel, channel_id), fut in zip(targets, futures):
+        try:
+            res = fut.result()
+        except Exception as e:
+            res = {"ok": False, "status": 500, "resp": {"error": str(e)}}
+        results.append({"channel": channel, "channel_id": channel_id, **res})
+
+    delivered = sum(1 for r in results if r["ok"])
+    return {
+        "ok": delivered == len(results),
+        "status": 200 if delivered == len(results) else (207 if delivered else 400),
+        "delivered": delivered,
+        "failed": len(results) - delivered,
+        "results": results,
+    }
+
+def update_message(
+    token: str,
+    channel_id: str,
+    ts: str,
+    text: str,
+    *,
+    workspace: Optional[str] = None,
+    max_wait: Optional[float] = None,
+) -> Dict[str, Any]:
+
+    payload = {"channel": channel_id, "ts": ts, "text": text or " "}
+    return _call(token, "chat.update", payload, workspace, max_wait=max_wait)
+
+def stream_summary_to_slack(
+    token: str,
+    channel: str,
+    chunks: Iterable[str],
+    *,
+    placeholder: str = "_Summarizing…_",
+    interval_secs: float = UPDATE_INTERVAL_SECS,
+    link_names: bool = True,
+) -> Dict[str, Any]:
+
+    auth, denied = _authorize(token)
+    if denied:
+        return denied
+
+    workspace = auth.get("team_id") or token_hash(token)
+
+    norm = _normalize_channel(channel)
+    channel_id = _lookup_channel_id(token, norm, auth.get("team_id")) or norm
+
+    posted = _deliver(token, workspace, _build_payload(channel_id, placeholder, None, None, False, link_names))
+    if not posted["ok"]:
+        return posted
+
+    channel_id = posted["resp"].get("channel") or channel_id
+    ts = posted["resp"].get("ts")
+    parts: List[str] = []
+    updates = 0
+    last = time.monotonic()
+
+    try:
+        for chunk in chunks:
+            parts.append(chunk)
+            now = time.monotonic()
+            if now - last < interval_secs:
+                continue
+            res = update_message(token, channel_id, ts, "".join(parts).rstrip() + " …", workspace=workspace, max_wait=0)
+            if res.get("ok"):
+                updates += 1
+                last = now
+    except Exception as e:
+        text = "".join(parts).strip()
+        update_message(token, channel_id, ts, (text + "\n\n" if text else "") + "_Summary interrupted._",
+                       workspace=workspace, max_wait=FINAL_UPDATE_MAX_WAIT_SECS)
+        return {"ok": False, "status": 500, "resp": {"error": f"stream_failed: {e}", "channel": channel_id, "ts": ts}, "stream_failed": True}
+
+    text = "".join(parts).strip()
+    final = update_message(token, channel_id, ts, text, workspace=workspace, max_wait=FINAL_UPDATE_MAX_WAIT_SECS)
+    if final.get("ok"):
+        final.pop("sent", None)
+        final.update(text=text, updates=updates + 1)
+        return final
+
+    # The placeholder is already in the channel, so the caller must not resend;
+    # keep retrying the last edit in the background instead.
+    queued = final.get("retry_after") is not None and FINAL_UPDATE_RETRIES > 0
+    if queued:
+        _schedule_final_update(token, channel_id, ts, text, workspace, final["retry_after"], FINAL_UPDATE_RETRIES)
+    return {
+        "ok": True,
+        "status": 207,
+        "resp": {"channel": channel_id, "ts": ts, "error": (final.get("resp") or {}).get("error")},
+        "text": text,
+        "updates": updates,
+        "final_update_failed": True,
+        "final_update_queued": queued,
+    }
+
+# Waiting out Retry-After on a timer keeps the broadcast workers free for
+# /slack/broadcast instead of parking one per stuck edit.
+def _schedule_final_update(token: str, channel_id: str, ts: str, text: str, workspace: str, retry_after: float, attempts: int) -> None:
+    timer = threading.Timer(retry_after, _retry_final_update, args=(token, channel_id, ts, text, workspace, attempts))
+    timer.daemon = True
+    timer.start()
+
+def _retry_final_update(token: str, channel_id: str, ts: str, text: str, workspace: str, attempts: int) -> None:
+    res = update_message(token, channel_id, ts, text, workspace=workspace, max_wait=FINAL_UPDATE_MAX_WAIT_SECS)
+    if res.get("ok"):
+        return
+    if res.get("retry_after") is not None and attempts > 1:
+        _schedule_final_update(token, channel_id, ts, text, workspace, res["retry_after"], attempts - 1)
+        return
+    log.warning("slack: final update of %s/%s never landed", channel_id, ts)
@@ -0,0 +1,261 @@
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional, Set
+
+import http_pool
+from metrics import upstream_timer
+from singleflight import SingleFlight
+from token_bucket import retry_after_header
+from integrations.slack_ratelimit import limiter
+
+log = logging.getLogger(__name__)
+
+SLACK_API = "https://slack.com/api"
+DEFAULT_TIMEOUT = 20
+PAGE_LIMIT = 1000
+MAX_PAGES = int(os.getenv("SLACK_CHANNEL_MAX_PAGES", "50"))
+REFRESH_SECS = float(os.getenv("SLACK_CHANNEL_REFRESH_SECS", "300"))
+MISS_REFRESH_SECS = float(os.getenv("SLACK_CHANNEL_MISS_REFRESH_SECS", "30"))
+PAGE_MAX_WAIT_SECS = float(os.getenv("SLACK_CHANNEL_PAGE_MAX_WAIT_SECS", "3.5"))
+COLD_WAIT_SECS = float(os.getenv("SLACK_CHANNEL_COLD_WAIT_SECS", "2"))
+IDLE_SECS = float(os.getenv("SLACK_CHANNEL_INDEX_IDLE_SECS", "3600"))
+AUTH_ERRORS = ("invalid_auth", "token_revoked", "token_expired", "account_inactive", "not_authed")
+
+class ChannelIndex:
+    def __init__(self, team_id: str):
+        self.team_id = team_id
+        self._by_name: Dict[str, Dict[str, Any]] = {}
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._members: Set[str] = set()
+        self._lock = threading.Lock()
+        self.built_at = 0.0
+        self.last_used = time.monotonic()
+        self.refreshes = 0
+
+    @property
+    def built(self) -> bool:
+        return self.built_at > 0
+
+    def lookup(self, name: str) -> Optional[Dict[str, Any]]:
+        return self._by_name.get(name.lstrip("#").lower())
+
+    def get(self, channel_id: str) -> Optional[Dict[str, Any]]:
+        return self._by_id.get(channel_id)
+
+    def replace(self, channels: Dict[str, Dict[str, Any]]) -> None:
+        by_id = {ch["id"]: ch for ch in channels.values()}
+        with self._lock:
+            joined = {cid for cid in self._members if cid not in by_id}
+            self._members = {cid for cid, ch in by_id.items() if ch["is_member"]} | joined
+            self._by_name = channels
+            self._by_id = by_id
+            self.built_at = time.monotonic()
+            self.refreshes += 1
+
+    def upsert(self, channel_id: str, **fields) -> None:
+        with self._lock:
+            entry = self._by_id.get(channel_id)
+            if entry is None:
+                return
+            entry.update(fields)
+
+    def is_member(self, channel_id: str) -> Optional[bool]:
+        if channel_id in self._members:
+            return True
+        return False if channel_id in self._by_id else None
+
+    def mark_member(self, channel_id: str, member: bool = True) -> None:
+        with self._lock:
+            if member:
+                self._members.add(channel_id)
+            else:
+                self._members.discard(channel_id)
+            entry = self._by_id.get(channel_id)
+            if entry is not None:
+                entry["is_member"] = member
+
+    def stale(self, max_age: float) -> bool:
+        return time.monotonic() - self.built_at >= max_age
+
+    def __len__(self) -> int:
+        return len(self._by_name)
+
+def _entry(ch: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": ch.get("id"),
+        "name": ch.get("name"),
+        "is_archived": bool(ch.get("is_archived")),
+        "is_member": bool(ch.get("is_member")),
+        "is_private": bool(ch.get("is_private")),
+    }
+
+ALL_TYPES = "public_channel,private_channel"
+PUBLIC_TYPES = "public_channel"
+
+# Workspaces whose token lacks groups:read; listing private channels fails
+# with missing_scope there, so we only ask for public ones.
+_public_only: Set[str] = set()
+
+def fetch_channels(token: str, workspace: str) -> Optional[Dict[str, Dict[str, Any]]]:
+    channels: Dict[str, Dict[str, Any]] = {}
+    cursor = None
+    types = PUBLIC_TYPES if workspace in _public_only else ALL_TYPES
+    for _ in range(MAX_PAGES):
+        params = {
+            "exclude_archived": "false",
+            "types": types,
+            "limit": PAGE_LIMIT,
+        }
+        if cursor:
+            params["cursor"] = cursor
+
+        granted, wait = limiter.reserve(workspace, "conversations.list", max_wait=PAGE_MAX_WAIT_SECS)
+        if not granted:
+            log.debug("slack channel index: deferred for %.1fs by rate limiter", wait)
+            return None
+        if wait:
+            time.sleep(wait)
+
+        with upstream_timer("slack", "conversations.list") as t:
+            r = http_pool.get(
+                f"{SLACK_API}/conversations.list",
+                headers={"Authorization": f"Bearer {token}"},
+                params=params,
+                timeout=DEFAULT_TIMEOUT,
+            )
+            t.status = r.status_code
+        if r.status_code == 429:
+            limiter.penalize(workspace, "conversations.list", retry_after_header(r.headers))
+            return None
+        try:
+            data = r.json()
+        except Exception:
+            data = {}
+        if not data.get("ok") and data.get("error") == "missing_scope" and types == ALL_TYPES:
+            log.debug("slack channel index: no private channel scope for %s, listing public channels only", workspace)
+            _public_only.add(workspace)
+            return fetch_channels(token, workspace)
+        if not data.get("ok"):
+            log.debug("slack channel index: conversations.list failed %s %s", r.status_code, data.get("error"))
+            if data.get("error") in AUTH_ERRORS:
+                forget_token(token)
+            return None
+
+        for ch in data.get("channels", []):
+            if ch.get("id") and ch.get("name"):
+                channels[ch["name"].lower()] = _entry(ch)
+
+        cursor = (data.get("response_metadata") or {}).get("next_cursor") or None
+        if not cursor:
+            break
+    return channels
+
+_indexes: Dict[str, ChannelIndex] = {}
+_tokens: Dict[str, str] = {}
+_last_miss_refresh: Dict[str, float] = {}
+_lock = threading.Lock()
+_builds = SingleFlight()
+_refresher: Optional[threading.Thread] = None
+
+def _rebuild(team_id: str, token: str) -> bool:
+    channels = fetch_channels(token, team_id)
+    if channels is None:
+        return False
+    index_for(team_id).replace(channels)
+    return True
+
+def rebuild(team_id: str, token: str) -> bool:
+    return _builds.do(team_id, _rebuild, team_id, token)
+
+def forget_token(token: str) -> None:
+    # A dead token must not be kept around or used for background refreshes.
+    with _lock:
+        for team_id in [t for t, tok in _tokens.items() if tok == token]:
+            _tokens.pop(team_id, None)
+
+def _refresh_loop() -> None:
+    while True:
+        time.sleep(max(1.0, REFRESH_SECS / 4))
+        now = time.monotonic()
+        for team_id, index in list(_indexes.items()):
+            if now - index.last_used >= IDLE_SECS:
+                with _lock:
+                    _indexes.pop(team_id, None)
+                    _tokens.pop(team_id, None)
+                    _last_miss_refresh.pop(team_id, None)
+                continue
+            token = _tokens.get(team_id)
+            if token and index.built and index.stale(REFRESH_SECS):
+                try:
+                    rebuild(team_id, token)
+                except Exception as e:
+                    log.debug("slack channel index: background refresh failed for %s: %s", team_id, e)
+
+def _ensure_refresher() -> None:
+    global _refresher
+    if _refresher is not None and _refresher.is_alive():
+        return
+    with _lock:
+        if _refresher is None or not _refresher.is_alive():
+            _refresher = threading.Thread(target=_refresh_loop, name="slack-channel-index", daemon=True)
+            _refresher.start()
+
+def index_for(team_id: str) -> ChannelIndex:
+    index = _indexes.get(team_id)
+    if index is None:
+        with _lock:
+            index = _indexes.setdefault(team_id, ChannelIndex(team_id))
+    return index
+
+def _touch(token: str, team_id: str) -> ChannelIndex:
+    _tokens[team_id] = token
+    _ensure_refresher()
+    index = index_for(team_id)
+    index.last_used = time.monotonic()
+    return index
+
+def _rebuild_within(team_id: str, token: str, timeout: float) -> None:
+    # A large workspace can take many paced pages to list; wait a bounded time
+    # and let the build finish in the background. Callers fall back to
+    # posting by "#name", which Slack resolves itself.
+    worker = threading.Thread(target=rebuild, args=(team_id, token), name="slack-channel-index-build", daemon=True)
+    worker.start()
+    worker.join(timeout)
+
+def prime(token: str, team_id: str) -> None:
+    if _touch(token, team_id).built or _builds.in_flight(team_id):
+        return
+    now = time.monotonic()
+    if now - _last_miss_refresh.get(team_id, 0.0) < MISS_REFRESH_SECS:
+        return
+    _last_miss_refresh[team_id] = now
+    threading.Thread(target=rebuild, args=(team_id, token), name="slack-channel-index-prime", daemon=True).start()
+
+def resolve(token: str, team_id: str, name: str) -> Optional[Dict[str, Any]]:
+    index = _touch(token, team_id)
+
+    if not index.built:
+        _last_miss_refresh[team_id] = time.monotonic()
+        _rebuild_within(team_id, token, COLD_WAIT_SECS)
+
+    entry = index.lookup(name)
+    if entry is not None:
+        return entry
+
+    now = time.monotonic()
+    if now - _last_miss_refresh.get(team_id, 0.0) >= MISS_REFRESH_SECS:
+        _last_miss_refresh[team_id] = now
+        _rebuild_within(team_id, token, COLD_WAIT_SECS)
+        entry = index.lookup(name)
+    return entry
+
+def stats() -> Dict[str, Any]:
+    return {
+        "workspaces": {
+            team_id: {"channels": len(index), "members": len(index._members), "refreshes": index.refreshes}
+            for team_id, index in list(_indexes.items())
+        },
+        "builds": _builds.stats(),
+    }
@@ -0,0 +1,59 @@
+import os
+import time
+import threading
+from typing import Dict, Optional, Tuple
+
+import metrics
+from token_bucket import TokenBucket
+
+# Published per-method limits (requests per minute) for the Web API tiers we use.
+# chat.postMessage is "special": roughly one message per second per channel.
+TIERS: Dict[str, Tuple[str, float, float]] = {
+    "auth.test":            ("tier4", 100.0, 20.0),
+    "conversations.list":   ("tier2", 20.0, 10.0),
+    "conversations.join":   ("tier3", 50.0, 10.0),
+    "chat.update":          ("tier3", 50.0, 10.0),
+    "chat.postMessage":     ("special", 60.0, 3.0),
+}
+DEFAULT_TIER = ("tier3", 50.0, 10.0)
+
+MAX_PACE_SECS = float(os.getenv("SLACK_MAX_PACE_SECS", "1.0"))
+
+_DECISIONS = metrics.REGISTRY.register(metrics.Counter(
+    "slack_ratelimit_decisions_total", "Slack scheduler decisions by method and outcome.", ("method", "outcome"),
+))
+
+class SlackRateLimiter:
+    def __init__(self, max_pace_secs: float = MAX_PACE_SECS):
+        self.max_pace_secs = max_pace_secs
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple[str, str, str], TokenBucket] = {}
+
+    def _bucket(self, workspace: str, method: str, channel: Optional[str]) -> TokenBucket:
+        tier, per_minute, burst = TIERS.get(method, DEFAULT_TIER)
+        if tier == "special":
+            key = (workspace, method, channel or "")
+        else:
+            key = (workspace, tier, "")
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets.setdefault(key, TokenBucket(per_minute, burst))
+        return bucket
+
+    def reserve(self, workspace: str, method: str, channel: Optional[str] = None, max_wait: Optional[float] = None) -> Tuple[bool, float]:
+        max_wait = self.max_pace_secs if max_wait is None else max_wait
+        with self._lock:
+            granted, wait = self._bucket(workspace, method, channel).reserve(time.monotonic(), max_wait)
+        _DECISIONS.inc(method, "deferred" if not granted else ("paced" if wait > 0 else "granted"))
+        return granted, wait
+
+    def penalize(self, workspace: str, method: str, retry_after: float, channel: Optional[str] = None) -> None:
+        with self._lock:
+            self._bucket(workspace, method, channel).penalize(time.monotonic(), retry_after)
+        _DECISIONS.inc(method, "throttled")
+
+    def recover(self, workspace: str, method: str, channel: Optional[str] = None) -> None:
+        with self._lock:
+            self._bucket(workspace, method, channel).recover()
+
+limiter = SlackRateLimiter()
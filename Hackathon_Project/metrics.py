@@ -0,0 +1,202 @@
+import time
+import threading
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _num(value: float) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple, Any] = {}
+
+    def _child(self, labels: Tuple):
+        child = self._children.get(labels)
+        if child is None:
+            with self._lock:
+                child = self._children.get(labels)
+                if child is None:
+                    child = self._new_child()
+                    self._children[labels] = child
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class _CounterChild:
+    __slots__ = ("lock", "value")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0.0
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        child = self._child(labels)
+        with child.lock:
+            child.value += amount
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, child in list(self._children.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_num(child.value)}")
+        return lines
+
+class _HistogramChild:
+    __slots__ = ("lock", "counts", "sum", "count")
+
+    def __init__(self, size: int):
+        self.lock = threading.Lock()
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(len(self.buckets) + 1)
+
+    def observe(self, value: float, *labels) -> None:
+        child = self._child(labels)
+        idx = bisect_left(self.buckets, value)
+        with child.lock:
+            child.counts[idx] += 1
+            child.sum += value
+            child.count += 1
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, child in list(self._children.items()):
+            with child.lock:
+                counts = list(child.counts)
+                total, count = child.sum, child.count
+            running = 0
+            for bound, n in zip(self.buckets, counts):
+                running += n
+                le = 'le="%s"' % _num(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {running}")
+            inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, inf)} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_num(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, Dict[str, Any], float]]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn: Callable[[], Iterable[Tuple[str, str, str, Dict[str, Any], float]]]):
+        with self._lock:
+            self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics):
+            lines.extend(metric.render())
+
+        grouped: Dict[str, Tuple[str, str, List[str]]] = {}
+        for fn in list(self._collectors):
+            try:
+                samples = list(fn())
+            except Exception:
+                continue
+            for name, kind, help, labels, value in samples:
+                entry = grouped.setdefault(name, (kind, help, []))
+                entry[2].append(f"{name}{_labels(list(labels), list(labels.values()))} {_num(value)}")
+        for name, (kind, help, samples) in grouped.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(samples)
+
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Flask request latency by route.", ("route", "method"),
+))
+REQUESTS = REGISTRY.register(Counter(
+    "http_requests_total", "Flask responses by route and status code.", ("route", "method", "status"),
+))
+UPSTREAM_LATENCY = REGISTRY.register(Histogram(
+    "upstream_request_duration_seconds", "Latency of calls to external services.", ("upstream", "operation"),
+))
+UPSTREAM_RESPONSES = REGISTRY.register(Counter(
+    "upstream_responses_total", "External call outcomes by status code.", ("upstream", "operation", "status"),
+))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "gemini_tokens_total", "Gemini token usage reported by the API.", ("model", "kind"),
+))
+
+class upstream_timer:
+    __slots__ = ("upstream", "operation", "status", "_started")
+
+    def __init__(self, upstream: str, operation: str):
+        self.upstream = upstream
+        self.operation = operation
+        self.status: Optional[Any] = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        UPSTREAM_LATENCY.observe(time.perf_counter() - self._started, self.upstream, self.operation)
+        status = "error" if exc_type is not None else (self.status if self.status is not None else "ok")
+        UPSTREAM_RESPONSES.inc(self.upstream, self.operation, status)
+        return False
+
+def register_cache(name: str, stats: Callable[[], Dict[str, Any]]) -> None:
+    def collect():
+        s = stats()
+        labels = {"cache": name}
+        yield "cache_hits_total", "counter", "Cache hits.", labels, s.get("hits", 0)
+        yield "cache_misses_total", "counter", "Cache misses.", labels, s.get("misses", 0)
+        yield "cache_evictions_total", "counter", "Cache evictions.", labels, s.get("evictions", 0)
+        yield "cache_size", "gauge", "Entries currently cached.", labels, s.get("size", 0)
+        yield "cache_hit_ratio", "gauge", "Hits over lookups since start.", labels, s.get("hit_rate", 0.0)
+
+    REGISTRY.collector(collect)
+
+def render() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,231 @@
+import os
+import time
+import sqlite3
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+class BucketedNonceStore:
+    def __init__(self, window_secs: int = 300, bucket_secs: int = 30, max_entries: int = 1_000_000):
+        self.window_secs = int(window_secs)
+        self.bucket_secs = max(1, int(bucket_secs))
+        self.max_entries = max(1, int(max_entries))
+        # Nonces are bucketed by their request timestamp, which is only accepted
+        # within +/- window of now, so 2 * window (+ edge buckets) covers every
+        # nonce that can still be replayed.
+        self._slots = 2 * (self.window_secs // self.bucket_secs + 1) + 1
+        self._buckets: List[Set[str]] = [set() for _ in range(self._slots)]
+        self._epochs: List[int] = [-1] * self._slots
+        self._live: List[Set[str]] = []
+        self._live_oldest: Optional[int] = None
+        self._lock = threading.Lock()
+        self._size = 0
+        self.inserts = 0
+        self.replays = 0
+        self.rejected_window = 0
+        self.rejected_full = 0
+        self.expired_buckets = 0
+        self.evictions = 0
+
+    def _oldest_live(self, now: float) -> int:
+        return int(now - self.window_secs) // self.bucket_secs
+
+    def _expire(self, slot: int) -> None:
+        bucket = self._buckets[slot]
+        if bucket:
+            self._size -= len(bucket)
+            self.evictions += len(bucket)
+            self._buckets[slot] = set()
+        self._epochs[slot] = -1
+        self._live_oldest = None
+        self.expired_buckets += 1
+
+    def _sweep(self, oldest: int) -> None:
+        for slot, epoch in enumerate(self._epochs):
+            if epoch != -1 and epoch < oldest:
+                self._expire(slot)
+
+    def add_if_absent(self, nonce: str, ts: float, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        if abs(now - ts) > self.window_secs:
+            with self._lock:
+                self.rejected_window += 1
+            return False
+
+        epoch = int(ts) // self.bucket_secs
+        slot = epoch % self._slots
+        oldest = self._oldest_live(now)
+
+        with self._lock:
+            current = self._epochs[slot]
+            if current != epoch and current != -1:
+                if current > epoch:
+                    self.rejected_window += 1
+                    return False
+                self._expire(slot)
+                current = -1
+
+            if current == -1:
+                self._epochs[slot] = epoch
+                self._live_oldest = None
+
+            if self._live_oldest != oldest:
+                self._live = [b for b, e in zip(self._buckets, self._epochs) if e >= oldest]
+                self._live_oldest = oldest
+
+            for bucket in self._live:
+                if nonce in bucket:
+                    self.replays += 1
+                    return False
+
+            if self._size >= self.max_entries:
+                self._sweep(oldest)
+                if self._size >= self.max_entries:
+                    self.rejected_full += 1
+                    return False
+
+            self._buckets[slot].add(nonce)
+            self._size += 1
+            self.inserts += 1
+            return True
+
+    def __len__(self) -> int:
+        return self._size
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "size": self._size,
+                "max_entries": self.max_entries,
+                "buckets": self._slots,
+                "live_buckets": sum(1 for e in self._epochs if e != -1),
+                "inserts": self.inserts,
+                "replays": self.replays,
+                "rejected_window": self.rejected_window,
+                "rejected_full": self.rejected_full,
+                "expired_buckets": self.expired_buckets,
+                "evictions": self.evictions,
+            }
+
+class SqliteNonceStore:
+    def __init__(
+        self,
+        path: str,
+        window_secs: int = 300,
+        max_entries: int = 1_000_000,
+        expire_every: int = 1000,
+        expire_interval_secs: float = 10.0,
+    ):
+        self.path = path
+        self.window_secs = int(window_secs)
+        self.max_entries = max(1, int(max_entries))
+        self.expire_every = max(1, int(expire_every))
+        self.expire_interval_secs = float(expire_interval_secs)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._since_expiry = 0
+        self._last_expiry = 0.0
+        self._size = 0
+        self.inserts = 0
+        self.replays = 0
+        self.rejected_window = 0
+        self.rejected_full = 0
+        self.evictions = 0
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS nonces (nonce TEXT PRIMARY KEY, ts INTEGER NOT NULL) WITHOUT ROWID"
+        )
+        self._conn().execute("CREATE INDEX IF NOT EXISTS nonces_ts ON nonces (ts)")
+        # Counted once here and then tracked from our own inserts and deletes,
+        # so the ceiling costs nothing per request. Other processes sharing the
+        # file are not seen, which makes max_entries per process and approximate.
+        self._size = self._conn().execute("SELECT COUNT(*) FROM nonces").fetchone()[0]
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _maybe_expire(self, now: float) -> None:
+        with self._lock:
+            self._since_expiry += 1
+            due = (
+                self._since_expiry >= self.expire_every
+                or now - self._last_expiry >= self.expire_interval_secs
+                # When full, try to make room, but at most once a second.
+                or (self._size >= self.max_entries and now - self._last_expiry >= 1.0)
+            )
+            if not due:
+                return
+            self._since_expiry = 0
+            self._last_expiry = now
+
+        deleted = self._conn().execute("DELETE FROM nonces WHERE ts < ?", (int(now - self.window_secs),)).rowcount
+        with self._lock:
+            self.evictions += max(0, deleted)
+            self._size = max(0, self._size - max(0, deleted))
+
+    def add_if_absent(self, nonce: str, ts: float, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        if abs(now - ts) > self.window_secs:
+            with self._lock:
+                self.rejected_window += 1
+            return False
+
+        self._maybe_expire(now)
+        # Reserve the slot before inserting so concurrent requests cannot all
+        # slip past the ceiling together.
+        with self._lock:
+            if self._size >= self.max_entries:
+                self.rejected_full += 1
+                return False
+            self._size += 1
+
+        try:
+            inserted = self._conn().execute(
+                "INSERT OR IGNORE INTO nonces (nonce, ts) VALUES (?, ?)", (nonce, int(ts))
+            ).rowcount == 1
+        except Exception:
+            with self._lock:
+                self._size -= 1
+            raise
+        with self._lock:
+            if inserted:
+                self.inserts += 1
+            else:
+                self._size -= 1
+                self.replays += 1
+        return inserted
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM nonces").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        size = len(self)
+        with self._lock:
+            return {
+                "backend": "sqlite",
+                "size": size,
+                "max_entries": self.max_entries,
+                "inserts": self.inserts,
+                "replays": self.replays,
+                "rejected_window": self.rejected_window,
+                "rejected_full": self.rejected_full,
+                "evictions": self.evictions,
+            }
+
+def make_nonce_store(backend: str = "memory", **kwargs):
+    backend = (backend or "memory").lower()
+    if backend == "memory":
+        kwargs.pop("path", None)
+        return BucketedNonceStore(**kwargs)
+    if backend == "sqlite":
+        kwargs.pop("bucket_secs", None)
+        path = kwargs.pop("path", None) or os.path.join(tempfile.gettempdir(), "secaiagent-nonces.db")
+        return SqliteNonceStore(path, **kwargs)
+    raise ValueError(f"Unknown nonce store backend '{backend}'")
@@ -1,7 +1,16 @@
 import os
+import json
+import time
+import hashlib
+import threading
+from typing import Optional, Dict, Any, Tuple, Iterator
+
 import google.generativeai as genai
 from dotenv import load_dotenv
 
+from metrics import LLM_TOKENS, upstream_timer
+from singleflight import SingleFlight
+
 load_dotenv()
 _API_KEY = os.getenv("GEMINI_API_KEY")
 if not _API_KEY:
@@ -10,13 +19,135 @@ _MODEL = os.getenv("GEMINI_MODEL", "models/gemini-1.5-flash")
 
 genai.configure(api_key=_API_KEY)
 
+JSON_CONFIG = {"response_mime_type": "application/json"}
+
+def _config_key(generation_config: Optional[Dict[str, Any]]) -> str:
+    if not generation_config:
+        return ""
+    return json.dumps(generation_config, sort_keys=True, default=str)
+
+class ModelRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models: Dict[Tuple[str, str], Any] = {}
+        self._builds = 0
+        self._build_secs = 0.0
+        self._last_build_secs = 0.0
+        self._lookups = 0
+        self._hits = 0
+
+    def get(self, model: str, generation_config: Optional[Dict[str, Any]] = None):
+        key = (model, _config_key(generation_config))
+        handle = self._models.get(key)
+        if handle is not None:
+            with self._lock:
+                self._lookups += 1
+                self._hits += 1
+            return handle
+
+        with self._lock:
+            self._lookups += 1
+            handle = self._models.get(key)
+            if handle is not None:
+                self._hits += 1
+                return handle
+
+            started = time.perf_counter()
+            handle = genai.GenerativeModel(model, generation_config=generation_config)
+            elapsed = time.perf_counter() - started
+
+            self._models[key] = handle
+            self._builds += 1
+            self._build_secs += elapsed
+            self._last_build_secs = elapsed
+            return handle
+
+    def warm(self, model: str, generation_config: Optional[Dict[str, Any]] = None) -> None:
+        self.get(model, generation_config)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "models": len(self._models),
+                "builds": self._builds,
+                "build_ms_total": round(self._build_secs * 1000, 3),
+                "build_ms_last": round(self._last_build_secs * 1000, 3),
+                "lookups": self._lookups,
+                "hits": self._hits,
+            }
+
+def _parse_json(text: str) -> Any:
+    text = (text or "").strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Gemini returned invalid JSON: {e}") from e
+
+def _record_usage(model: str, resp) -> None:
+    usage = getattr(resp, "usage_metadata", None)
+    if not usage:
+        return
+    for kind, field in (("prompt", "prompt_token_count"), ("completion", "candidates_token_count")):
+        n = getattr(usage, field, 0) or 0
+        if n:
+            LLM_TOKENS.inc(model, kind, amount=n)
+
+_registry = ModelRegistry()
+_inflight = SingleFlight()
+
 class GeminiClient:
-    def __init__(self, model: str | None = None):
+    def __init__(
+        self,
+        model: str | None = None,
+        generation_config: Optional[Dict[str, Any]] = None,
+        registry: Optional[ModelRegistry] = None,
+    ):
         self.model = model or _MODEL
+        self.generation_config = generation_config
+        self.registry = registry or _registry
+        self.inflight = _inflight
+
+    def _handle(self, generation_config: Optional[Dict[str, Any]] = None):
+        return self.registry.get(self.model, generation_config or self.generation_config)
+
+    def _json_config(self) -> Dict[str, Any]:
+        return {**(self.generation_config or {}), **JSON_CONFIG}
+
+    def warm(self) -> None:
+        self.registry.warm(self.model, self.generation_config)
+        self.registry.warm(self.model, self._json_config())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "registry": self.registry.stats(),
+            "singleflight": self.inflight.stats(),
+        }
+
+    def _flight_key(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None) -> str:
+        h = hashlib.sha256()
+        for part in (self.model, _config_key(generation_config or self.generation_config), prompt):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
 
     def generate(self, prompt: str) -> str:
-        model = genai.GenerativeModel(self.model)
-        resp = model.generate_content(prompt)
+        return self.inflight.do(self._flight_key(prompt), self._generate, prompt)
+
+    def generate_json(self, prompt: str) -> Any:
+        config = self._json_config()
+        text = self.inflight.do(self._flight_key(prompt, config), self._generate, prompt, config)
+        return _parse_json(text)
+
+    def _generate(self, prompt: str, generation_config: Optional[Dict[str, Any]] = None) -> str:
+        model = self._handle(generation_config)
+        with upstream_timer("gemini", "generate_content"):
+            resp = model.generate_content(prompt)
+        _record_usage(self.model, resp)
         text = getattr(resp, "text", None)
         if text:
             return text.strip()
@@ -26,3 +157,18 @@ class GeminiClient:
             return candidates[0].content.parts[0].text.strip()
 
         return ""
+
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        model = self._handle()
+        last = None
+        with upstream_timer("gemini", "stream_generate_content"):
+            for chunk in model.generate_content(prompt, stream=True):
+                last = chunk
+                try:
+                    text = chunk.text
+                except ValueError:
+                    text = ""
+                if text:
+                    yield text
+        if last is not None:
+            _record_usage(self.model, last)
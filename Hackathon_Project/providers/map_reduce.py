@@ -0,0 +1,106 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+CHARS_PER_TOKEN = 4
+MAX_ROUNDS = 3
+
+MAP_PROMPT = (
+    "Summarize this portion of raw team updates as terse bullet points. "
+    "Keep every person, task, blocker and follow-up; do not add a title.\n\n"
+)
+
+REDUCE_NOTE = (
+    "The updates below are partial summaries of consecutive portions of a larger "
+    "set of raw updates. Merge them into one result.\n\n"
+)
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def _hard_split(line: str, max_chars: int) -> List[str]:
+    pieces = []
+    while len(line) > max_chars:
+        cut = line.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(line[:cut])
+        line = line[cut:].lstrip()
+    if line:
+        pieces.append(line)
+    return pieces
+
+def split_messages(text: str, max_tokens: int) -> List[str]:
+    max_chars = max(1, max_tokens * CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return [text] if text else []
+
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in text.splitlines():
+        for piece in (_hard_split(line, max_chars) if len(line) > max_chars else [line]):
+            if current and size + len(piece) + 1 > max_chars:
+                chunks.append("\n".join(current).strip("\n"))
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece) + 1
+    if current:
+        chunks.append("\n".join(current).strip("\n"))
+    return [c for c in chunks if c.strip()]
+
+class MapReduceSummarizer:
+    def __init__(self, llm, chunk_tokens: int = 6000, max_workers: int = 4):
+        self.llm = llm
+        self.chunk_tokens = max(1, int(chunk_tokens))
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="summary-map")
+        self._lock = threading.Lock()
+        self._runs = 0
+        self._chunks_total = 0
+        self._last: Dict[str, Any] = {}
+
+    def _map_one(self, chunk: str):
+        started = time.perf_counter()
+        partial = self.llm.generate(f"{MAP_PROMPT}{chunk}")
+        return partial, (time.perf_counter() - started) * 1000
+
+    def prepare(self, template: str, raw: str) -> str:
+        chunks = split_messages(raw, self.chunk_tokens)
+        if len(chunks) <= 1:
+            return f"{template}{raw}"
+
+        started = time.perf_counter()
+        rounds = 0
+        latencies: List[float] = []
+        chunk_count = len(chunks)
+        while len(chunks) > 1 and rounds < MAX_ROUNDS:
+            results = list(self._pool.map(self._map_one, chunks))
+            latencies.extend(round(ms, 1) for _, ms in results)
+            merged = "\n\n".join(p for p, _ in results if p)
+            rounds += 1
+            chunks = split_messages(merged, self.chunk_tokens)
+
+        with self._lock:
+            self._runs += 1
+            self._chunks_total += chunk_count
+            self._last = {
+                "chunks": chunk_count,
+                "rounds": rounds,
+                "chunk_ms": latencies,
+                "map_ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+
+        return f"{template}{REDUCE_NOTE}{merged}"
+
+    def summarize(self, template: str, raw: str) -> str:
+        return self.llm.generate(self.prepare(template, raw))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "chunk_tokens": self.chunk_tokens,
+                "runs": self._runs,
+                "chunks_total": self._chunks_total,
+                "last": dict(self._last),
+            }
@@ -0,0 +1,45 @@
+import time
+from typing import Tuple
+
+MIN_RATE_FRACTION = 0.25
+
+class TokenBucket:
+    __slots__ = ("base_rate", "rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, per_minute: float, burst: float):
+        self.base_rate = per_minute / 60.0
+        self.rate = self.base_rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, now: float, max_wait: float) -> Tuple[bool, float]:
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1.0:
+            wait = max(wait, (1.0 - self.tokens) / self.rate)
+        if wait > max_wait:
+            return False, wait
+        self.tokens -= 1.0
+        return True, wait
+
+    def penalize(self, now: float, retry_after: float) -> None:
+        self._refill(now)
+        self.blocked_until = max(self.blocked_until, now + retry_after)
+        self.tokens = min(self.tokens, 0.0)
+        self.rate = max(self.base_rate * MIN_RATE_FRACTION, self.rate * 0.75)
+
+    def recover(self) -> None:
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate * 1.05)
+
+def retry_after_header(resp_headers, default: float = 1.0) -> float:
+    try:
+        return float(resp_headers.get("Retry-After", default))
+    except (TypeError, ValueError):
+        return default
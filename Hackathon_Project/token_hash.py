@@ -0,0 +1,6 @@
+import hashlib
+
+def token_hash(token: str) -> str:
+    # Stable per-token key for caches and limiters, so raw tokens never sit in
+    # memory as dict keys or show up in stats.
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()